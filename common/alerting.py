@@ -0,0 +1,210 @@
+import collections
+from dataclasses import dataclass, asdict
+import datetime
+import logging
+import queue
+import threading
+import time
+import typing
+
+from . import model
+from . import observer
+from . import util
+
+
+logger = logging.getLogger(__name__)
+
+MetricKey = typing.Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class Alert:
+    componentId: str
+    metricId: str
+    previous: model.Status
+    status: model.Status
+    timestamp: str
+    consecutiveTimeouts: int
+    ewmaResponseTime: typing.Optional[float]
+    errorRate: float
+
+    def as_payload(self) -> dict:
+        payload = asdict(self)
+        payload['previous'] = self.previous.value
+        payload['status'] = self.status.value
+        return payload
+
+
+class MetricState:
+    __slots__ = (
+        'expected_ms',
+        'consecutive_timeouts',
+        'ewma',
+        'window',
+        'errors',
+        'status',
+        'notified',
+        'last_notified',
+        'latest',
+    )
+
+    def __init__(
+        self,
+        expected_ms: typing.Optional[int],
+        window: int,
+    ):
+        self.expected_ms = expected_ms
+        self.consecutive_timeouts = 0
+        self.ewma: typing.Optional[float] = None
+        self.window: typing.Deque[bool] = collections.deque(maxlen=window)
+        self.errors = 0
+        self.status = model.Status.OK
+        self.notified = model.Status.OK
+        self.last_notified = float('-inf')
+        # newest result timestamp processed
+        self.latest: typing.Optional[datetime.datetime] = None
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / len(self.window) if self.window else 0.0
+
+
+class AlertEvaluator:
+    def __init__(
+        self,
+        observers: typing.List[observer.Observer],
+        window: int = 20,
+        ewma_alpha: float = 0.2,
+        down_after: int = 3,
+        error_rate_threshold: float = 0.5,
+        latency_factor: float = 1.0,
+        min_interval: float = 60.0,
+        is_error: typing.Callable[[model.Result], bool] = lambda res: res.timeout,
+        asynchronous: bool = True,
+    ):
+        self.observers = observers
+        self.window = window
+        self.ewma_alpha = ewma_alpha
+        self.down_after = down_after
+        self.error_rate_threshold = error_rate_threshold
+        self.latency_factor = latency_factor
+        self.min_interval = min_interval
+        self.is_error = is_error
+        self.states: typing.Dict[MetricKey, MetricState] = {}
+        self._expected: typing.Dict[MetricKey, int] = {}
+        self._queue: typing.Optional[queue.SimpleQueue] = None
+        self._thread: typing.Optional[threading.Thread] = None
+        if asynchronous:
+            # observers do blocking http calls, keep them off the ingest path
+            self._queue = queue.SimpleQueue()
+            self._thread = threading.Thread(target=self._dispatch_loop, name='alert-dispatch', daemon=True)
+            self._thread.start()
+        return
+
+    def update_metrics(
+        self,
+        components: typing.List[model.Component],
+    ):
+        self._expected = {
+            (c.id, m.id): m.expectedTime.as_ms()
+            for c in components
+            for m in c.metrics or ()
+        }
+        for key, state in self.states.items():
+            state.expected_ms = self._expected.get(key)
+
+    def _evaluate(
+        self,
+        state: MetricState,
+    ) -> model.Status:
+        if state.consecutive_timeouts >= self.down_after:
+            return model.Status.DOWN
+        if len(state.window) == self.window and state.error_rate >= self.error_rate_threshold:
+            return model.Status.DEGRADED
+        if state.expected_ms is not None and state.ewma is not None \
+                and state.ewma > state.expected_ms * self.latency_factor:
+            return model.Status.DEGRADED
+        return model.Status.OK
+
+    def process(
+        self,
+        res: model.Result,
+    ) -> typing.Optional[Alert]:
+        key = (res.componentId, res.metricId)
+        if not (state := self.states.get(key)):
+            state = self.states[key] = MetricState(expected_ms=self._expected.get(key), window=self.window)
+
+        # replayed or late results would roll the state back
+        timestamp = util.parse_timestamp(res.timestamp)
+        if state.latest and timestamp <= state.latest:
+            return None
+        state.latest = timestamp
+
+        if res.timeout:
+            state.consecutive_timeouts += 1
+        else:
+            state.consecutive_timeouts = 0
+            if state.ewma is None:
+                state.ewma = float(res.responseTime)
+            else:
+                state.ewma += self.ewma_alpha * (res.responseTime - state.ewma)
+
+        error = self.is_error(res)
+        if len(state.window) == state.window.maxlen and state.window[0]:
+            state.errors -= 1
+        state.window.append(error)
+        state.errors += error
+
+        state.status = self._evaluate(state=state)
+        # only transitions notify, and at most once per min_interval per metric
+        if state.status == state.notified:
+            return None
+        now = time.monotonic()
+        if now - state.last_notified < self.min_interval:
+            return None
+
+        alert = Alert(
+            componentId=res.componentId,
+            metricId=res.metricId,
+            previous=state.notified,
+            status=state.status,
+            timestamp=res.timestamp,
+            consecutiveTimeouts=state.consecutive_timeouts,
+            ewmaResponseTime=state.ewma,
+            errorRate=state.error_rate,
+        )
+        state.notified = state.status
+        state.last_notified = now
+
+        if self._queue is not None:
+            self._queue.put(alert)
+        else:
+            self._dispatch(alert=alert)
+        return alert
+
+    def __call__(
+        self,
+        res: model.Result,
+    ):
+        self.process(res=res)
+
+    def _dispatch(
+        self,
+        alert: Alert,
+    ):
+        payload = alert.as_payload()
+        for o in self.observers:
+            try:
+                o.notify(payload=payload)
+            except Exception as e:
+                logger.error(f'unable to notify observer {o.name}: {e}')
+
+    def _dispatch_loop(self):
+        while (alert := self._queue.get()) is not None:
+            self._dispatch(alert=alert)
+
+    def close(self):
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
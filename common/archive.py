@@ -0,0 +1,337 @@
+import array
+import datetime
+import mmap
+import os
+import typing
+import urllib.parse
+
+from . import exceptions
+from . import model
+
+
+# segment layout, all integers as LEB128 varints (signed ones zigzag encoded):
+#   magic | componentId | metricId | flags | count
+#   timestamps: length | first timestamp in us, then deltas to the previous one
+#   timeouts:   length | bitmap, one bit per result
+#   responses:  length | response times (0 where null)
+#   values:     length | dictionary size | dictionary entries | index per result (0 = None)
+#   nulls:      length | bitmap, set where the response time is null
+# timestamps are kept as microseconds since the epoch: timezone aware ones come back
+# as the same instant in UTC (the original offset is not kept), naive ones stay naive
+MAGIC = b'OMSEG\x01'
+SUFFIX = '.seg'
+
+FLAG_UTC = 0x01
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_UTC = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _write_uvarint(
+    buf: bytearray,
+    value: int,
+):
+    while value > 0x7f:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _write_varint(
+    buf: bytearray,
+    value: int,
+):
+    _write_uvarint(buf, (value << 1) ^ (value >> 63))
+
+
+def _read_uvarint(
+    data,
+    pos: int,
+) -> typing.Tuple[int, int]:
+    result = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_varint(
+    data,
+    pos: int,
+) -> typing.Tuple[int, int]:
+    value, pos = _read_uvarint(data, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def _write_bytes(
+    buf: bytearray,
+    value: bytes,
+):
+    _write_uvarint(buf, len(value))
+    buf += value
+
+
+def _read_bytes(
+    data,
+    pos: int,
+) -> typing.Tuple[bytes, int]:
+    length, pos = _read_uvarint(data, pos)
+    return bytes(data[pos:pos + length]), pos + length
+
+
+def _timestamp_to_us(
+    timestamp: str,
+) -> typing.Tuple[int, bool]:
+    ts = datetime.datetime.fromisoformat(str(timestamp))
+    if ts.tzinfo is None:
+        return (ts - _EPOCH) // datetime.timedelta(microseconds=1), False
+    return (ts - _EPOCH_UTC) // datetime.timedelta(microseconds=1), True
+
+
+def _us_to_timestamp(
+    us: int,
+    utc: bool,
+) -> str:
+    return str((_EPOCH_UTC if utc else _EPOCH) + datetime.timedelta(microseconds=us))
+
+
+def encode_segment(
+    results: typing.Sequence[model.Result],
+) -> bytes:
+    if not results:
+        raise exceptions.OpenmonitorError('refusing to encode an empty segment')
+
+    component_id, metric_id = results[0].componentId, results[0].metricId
+    timestamps = []
+    utc = None
+    for r in results:
+        if (r.componentId, r.metricId) != (component_id, metric_id):
+            raise exceptions.OpenmonitorError('a segment holds results of a single metric only')
+        us, aware = _timestamp_to_us(timestamp=r.timestamp)
+        if utc is None:
+            utc = aware
+        elif utc != aware:
+            raise exceptions.OpenmonitorError('mixed naive and timezone aware timestamps')
+        timestamps.append(us)
+
+    ts_col = bytearray()
+    prev = 0
+    for us in timestamps:
+        _write_varint(ts_col, us - prev)
+        prev = us
+
+    timeout_col = bytearray((len(results) + 7) // 8)
+    for i, r in enumerate(results):
+        if r.timeout:
+            timeout_col[i >> 3] |= 1 << (i & 7)
+
+    response_col = bytearray()
+    null_col = bytearray((len(results) + 7) // 8)
+    for i, r in enumerate(results):
+        if r.responseTime is None:
+            null_col[i >> 3] |= 1 << (i & 7)
+        _write_varint(response_col, r.responseTime or 0)
+
+    # probe values repeat a lot (status codes, error messages), dictionary encode them
+    dictionary: typing.Dict[str, int] = {}
+    indices = bytearray()
+    for r in results:
+        if r.value is None:
+            _write_uvarint(indices, 0)
+            continue
+        _write_uvarint(indices, dictionary.setdefault(r.value, len(dictionary) + 1))
+    value_col = bytearray()
+    _write_uvarint(value_col, len(dictionary))
+    for value in dictionary:
+        _write_bytes(value_col, value.encode())
+    value_col += indices
+
+    buf = bytearray(MAGIC)
+    _write_bytes(buf, component_id.encode())
+    _write_bytes(buf, metric_id.encode())
+    buf.append(FLAG_UTC if utc else 0)
+    _write_uvarint(buf, len(results))
+    for col in (ts_col, timeout_col, response_col, value_col, null_col):
+        _write_bytes(buf, col)
+    return bytes(buf)
+
+
+def segment_path(
+    directory: str,
+    results: typing.Sequence[model.Result],
+) -> str:
+    first, _ = _timestamp_to_us(timestamp=results[0].timestamp)
+    last, _ = _timestamp_to_us(timestamp=results[-1].timestamp)
+    return os.path.join(
+        directory,
+        urllib.parse.quote(results[0].componentId, safe=''),
+        urllib.parse.quote(results[0].metricId, safe=''),
+        f'{first:020d}-{last:020d}{SUFFIX}',
+    )
+
+
+def write_segment(
+    directory: str,
+    results: typing.Sequence[model.Result],
+) -> str:
+    data = encode_segment(results=results)
+    path = segment_path(directory=directory, results=results)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # results get deleted from the database once this returns, make sure they hit the disk
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+class SegmentReader:
+    def __init__(
+        self,
+        path: str,
+    ):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        data = self._mmap
+        if data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise exceptions.OpenmonitorError(f'{path} is not a result segment')
+
+        pos = len(MAGIC)
+        component_id, pos = _read_bytes(data, pos)
+        metric_id, pos = _read_bytes(data, pos)
+        self.componentId = component_id.decode()
+        self.metricId = metric_id.decode()
+        self.utc = bool(data[pos] & FLAG_UTC)
+        self.count, pos = _read_uvarint(data, pos + 1)
+
+        # (start, end) of each column inside the mapping
+        self._columns = []
+        for _ in range(5):
+            length, pos = _read_uvarint(data, pos)
+            self._columns.append((pos, pos + length))
+            pos += length
+        return
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._mmap.close()
+
+    def _dictionary(self) -> typing.Tuple[typing.List[typing.Optional[str]], int]:
+        pos, _ = self._columns[3]
+        size, pos = _read_uvarint(self._mmap, pos)
+        dictionary: typing.List[typing.Optional[str]] = [None]
+        for _ in range(size):
+            value, pos = _read_bytes(self._mmap, pos)
+            dictionary.append(value.decode())
+        return dictionary, pos
+
+    def _is_null(
+        self,
+        i: int,
+    ) -> bool:
+        null_pos, _ = self._columns[4]
+        return bool(self._mmap[null_pos + (i >> 3)] & (1 << (i & 7)))
+
+    def __iter__(self) -> typing.Iterator[model.Result]:
+        data = self._mmap
+        ts_pos, _ = self._columns[0]
+        timeout_pos, _ = self._columns[1]
+        response_pos, _ = self._columns[2]
+        dictionary, value_pos = self._dictionary()
+
+        us = 0
+        for i in range(self.count):
+            delta, ts_pos = _read_varint(data, ts_pos)
+            us += delta
+            response_time, response_pos = _read_varint(data, response_pos)
+            if self._is_null(i=i):
+                response_time = None
+            index, value_pos = _read_uvarint(data, value_pos)
+            yield model.Result(
+                metricId=self.metricId,
+                componentId=self.componentId,
+                value=dictionary[index],
+                timeout=bool(data[timeout_pos + (i >> 3)] & (1 << (i & 7))),
+                timestamp=_us_to_timestamp(us=us, utc=self.utc),
+                responseTime=response_time,
+            )
+
+    def arrays(self) -> typing.Dict[str, typing.Union[array.array, typing.List[typing.Optional[str]]]]:
+        data = self._mmap
+        timestamps = array.array('q')
+        responses = array.array('q')
+        response_nulls = array.array('b')
+        timeouts = array.array('b')
+        values: typing.List[typing.Optional[str]] = []
+
+        ts_pos, _ = self._columns[0]
+        timeout_pos, _ = self._columns[1]
+        response_pos, _ = self._columns[2]
+        dictionary, value_pos = self._dictionary()
+
+        us = 0
+        for i in range(self.count):
+            delta, ts_pos = _read_varint(data, ts_pos)
+            us += delta
+            timestamps.append(us)
+            response_time, response_pos = _read_varint(data, response_pos)
+            responses.append(response_time)
+            response_nulls.append(1 if self._is_null(i=i) else 0)
+            timeouts.append(1 if data[timeout_pos + (i >> 3)] & (1 << (i & 7)) else 0)
+            index, value_pos = _read_uvarint(data, value_pos)
+            values.append(dictionary[index])
+
+        return {
+            'timestamp': timestamps,
+            'timeout': timeouts,
+            'responseTime': responses,
+            'responseTimeNull': response_nulls,
+            'value': values,
+        }
+
+
+def list_segments(
+    directory: str,
+    component_id: str,
+    metric_id: str,
+) -> typing.List[str]:
+    metric_dir = os.path.join(
+        directory,
+        urllib.parse.quote(component_id, safe=''),
+        urllib.parse.quote(metric_id, safe=''),
+    )
+    if not os.path.isdir(metric_dir):
+        return []
+    # zero padded first timestamp in the name keeps lexical order chronological
+    return [
+        os.path.join(metric_dir, name)
+        for name in sorted(os.listdir(metric_dir))
+        if name.endswith(SUFFIX)
+    ]
+
+
+def iter_archived_results(
+    directory: str,
+    component_id: str,
+    metric_id: str,
+) -> typing.Iterator[model.Result]:
+    for path in list_segments(directory=directory, component_id=component_id, metric_id=metric_id):
+        with SegmentReader(path=path) as reader:
+            yield from reader
@@ -0,0 +1,171 @@
+import dataclasses
+import hashlib
+import json
+import os
+import typing
+
+from . import exceptions
+from . import model
+from . import util
+
+
+# JSON is the fast path: a 50k metric config loads in well under a second.
+# YAML goes through PyYAML, which takes seconds at that size even with libyaml,
+# keep it for small hand-written configs or convert large ones to JSON
+
+# path -> (file hash, parsed config), only the latest version of each file is kept
+_cache: typing.Dict[str, typing.Tuple[str, model.Config]] = {}
+
+
+def _parse_document(
+    raw: bytes,
+    path: str,
+) -> dict:
+    if os.path.splitext(path)[1].lower() == '.json':
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            raise exceptions.OpenmonitorConfigError(f'unable to parse {path}: {e}')
+
+    try:
+        import yaml
+    except ModuleNotFoundError:
+        raise exceptions.OpenmonitorNotSupported(f'PyYAML required to load {path}')
+
+    try:
+        return yaml.load(raw, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+    except yaml.YAMLError as e:
+        raise exceptions.OpenmonitorConfigError(f'unable to parse {path}: {e}')
+
+
+def _require(
+    entry: dict,
+    key: str,
+    kind: str,
+):
+    try:
+        return entry[key]
+    except (KeyError, TypeError):
+        raise exceptions.OpenmonitorConfigError(f'{kind} is missing {key!r}: {entry}')
+
+
+def _require_time(
+    entry: dict,
+    key: str,
+    kind: str,
+) -> model.TimeDetail:
+    time_str = _require(entry, key, kind)
+    if not isinstance(time_str, str):
+        raise exceptions.OpenmonitorConfigError(f'{kind} {key!r} must be a time string', time_str=time_str)
+    return util.parse_time_str_to_timedetail(time_str=time_str)
+
+
+def parse_config(
+    doc: dict,
+) -> model.Config:
+    if not isinstance(doc, dict):
+        raise exceptions.OpenmonitorConfigError('config root must be a mapping')
+
+    try:
+        version = model.Version(doc.get('version', model.Version.V1.value))
+    except ValueError:
+        raise exceptions.OpenmonitorConfigError(f'unsupported config version {doc.get("version")!r}')
+
+    systems: typing.List[model.System] = []
+    system_ids: typing.Set[str] = set()
+    for s in doc.get('systems') or ():
+        system = model.System(
+            id=_require(s, 'id', 'system'),
+            name=s.get('name', s['id']),
+            ref=s.get('ref'),
+        )
+        if system.id in system_ids:
+            raise exceptions.OpenmonitorConfigError(f'duplicate system id {system.id!r}')
+        system_ids.add(system.id)
+        systems.append(system)
+
+    components: typing.List[model.Component] = []
+    component_ids: typing.Set[str] = set()
+    for c in doc.get('components') or ():
+        component_id = _require(c, 'id', 'component')
+        if component_id in component_ids:
+            raise exceptions.OpenmonitorConfigError(f'duplicate component id {component_id!r}')
+        component_ids.add(component_id)
+
+        system_id = _require(c, 'systemId', 'component')
+        if system_id not in system_ids:
+            raise exceptions.OpenmonitorConfigError(
+                f'component {component_id!r} refers to unknown system {system_id!r}'
+            )
+
+        base_url = c.get('baseUrl')
+        auth_token = c.get('authToken')
+        metrics: typing.List[model.Metric] = []
+        metric_ids: typing.Set[str] = set()
+        for m in c.get('metrics') or ():
+            metric_id = _require(m, 'id', 'metric')
+            if metric_id in metric_ids:
+                raise exceptions.OpenmonitorConfigError(
+                    f'duplicate metric id {metric_id!r} in component {component_id!r}'
+                )
+            metric_ids.add(metric_id)
+
+            # probes join baseUrl and endpoint, one of metric or component has to set it
+            if not (metric_base_url := m.get('baseUrl', base_url)):
+                raise exceptions.OpenmonitorConfigError(
+                    f'metric {metric_id!r} in component {component_id!r} has no baseUrl'
+                )
+
+            metrics.append(model.Metric(
+                id=metric_id,
+                endpoint=_require(m, 'endpoint', 'metric'),
+                frequency=_require_time(m, 'frequency', 'metric'),
+                expectedTime=_require_time(m, 'expectedTime', 'metric'),
+                timeout=_require_time(m, 'timeout', 'metric'),
+                deleteAfter=_require_time(m, 'deleteAfter', 'metric'),
+                authToken=m.get('authToken', auth_token),
+                baseUrl=metric_base_url,
+            ))
+
+        components.append(model.Component(
+            id=component_id,
+            name=c.get('name', component_id),
+            systemId=system_id,
+            baseUrl=base_url,
+            ref=c.get('ref'),
+            authToken=auth_token,
+            metrics=metrics,
+        ))
+
+    return model.Config(
+        components=components,
+        systems=systems,
+        version=version,
+        cacheCallback=doc.get('cacheCallback'),
+    )
+
+
+def _copy(
+    cfg: model.Config,
+) -> model.Config:
+    # the dataclasses are frozen, copying the lists keeps callers from changing the cached config
+    return dataclasses.replace(
+        cfg,
+        systems=list(cfg.systems),
+        components=[dataclasses.replace(c, metrics=list(c.metrics)) for c in cfg.components],
+    )
+
+
+def load_config(
+    path: str,
+) -> model.Config:
+    with open(path, 'rb') as f:
+        raw = f.read()
+
+    digest = hashlib.sha256(raw).hexdigest()
+    if (cached := _cache.get(path)) and cached[0] == digest:
+        return _copy(cfg=cached[1])
+
+    cfg = parse_config(doc=_parse_document(raw=raw, path=path))
+    _cache[path] = (digest, cfg)
+    return _copy(cfg=cfg)
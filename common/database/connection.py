@@ -1,53 +1,270 @@
+import contextlib
 import dataclasses
+import datetime
 import logging
 import os
+import threading
+import time
 import typing
 
-import psycopg2
-import psycopg2.extras
+from . import schema
+import common.exceptions as exceptions
+import common.model as model
+import common.util as commonutil
 
-try:
-    import common.model as model
-    import common.util as commonutil
-except ModuleNotFoundError:
-    print('common package not in python path or dependencies not installed')
+psycopg2 = commonutil.lazy_import('psycopg2')
 
 
 logger = logging.getLogger(__name__)
 
+# metric.expectedTime is stored as time string (e.g. '200ms'), see TimeDetail.as_string
+_EXPECTED_MS = "(substring(m.expectedTime from '^[0-9]+')::bigint * " \
+               "CASE substring(m.expectedTime from '[a-z]+$') " \
+               "WHEN 'ms' THEN 1 WHEN 's' THEN 1000 WHEN 'm' THEN 60000 " \
+               "WHEN 'h' THEN 3600000 WHEN 'd' THEN 86400000 END)"
+
+_NOT_COMMENTED = "NOT EXISTS (SELECT 1 FROM comment cm " \
+                 "WHERE cm.componentId = r.componentId AND cm.metricId = r.metricId " \
+                 "AND r.timestamp >= cm.startTimestamp " \
+                 "AND (cm.endTimestamp IS NULL OR r.timestamp < cm.endTimestamp))"
+
+_UPSERT_COMMENT = "ON CONFLICT (metricId, componentId, timestamp) DO UPDATE SET " \
+                  "comment = EXCLUDED.comment, " \
+                  "startTimestamp = EXCLUDED.startTimestamp, " \
+                  "endTimestamp = EXCLUDED.endTimestamp"
+
+_SLA_COLUMNS = "COUNT(*), " \
+               "COUNT(*) FILTER (WHERE r.timeout), " \
+               f"COUNT(*) FILTER (WHERE NOT r.timeout AND r.responseTime <= {_EXPECTED_MS}), " \
+               "COALESCE(SUM(r.responseTime) FILTER (WHERE NOT r.timeout), 0)"
+
+
+def _comment_timestamp_key(
+    timestamp,
+):
+    # '...+00:00' and '...Z' name the same row, compare instants where possible
+    try:
+        return datetime.datetime.fromisoformat(str(timestamp))
+    except ValueError:
+        return timestamp
+
+
+@dataclasses.dataclass(frozen=True)
+class OperationTimeouts:
+    # seconds, None disables the respective limit
+    connect: typing.Optional[float] = None
+    statement: typing.Optional[float] = None
+    total: typing.Optional[float] = None
+
+
+class _Watchdog:
+    # one thread per connection, started on first use, cancels the running
+    # statement once its deadline passes
+    def __init__(
+        self,
+        cancel: typing.Callable[[], None],
+    ):
+        self._cancel = cancel
+        self._cond = threading.Condition()
+        self._deadline: typing.Optional[float] = None
+        self._closed = False
+        self._thread: typing.Optional[threading.Thread] = None
+        return
+
+    def arm(
+        self,
+        timeout: float,
+    ):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='database-watchdog', daemon=True)
+                self._thread.start()
+            self._deadline = time.monotonic() + timeout
+            self._cond.notify()
+
+    def disarm(self):
+        # once this returns the watchdog won't cancel anymore, a cancel in progress is waited for
+        with self._cond:
+            self._deadline = None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _run(self):
+        with self._cond:
+            while not self._closed:
+                if self._deadline is None:
+                    self._cond.wait()
+                elif (remaining := self._deadline - time.monotonic()) > 0:
+                    self._cond.wait(remaining)
+                else:
+                    self._deadline = None
+                    try:
+                        self._cancel()
+                    except Exception as e:
+                        logger.debug(f'cancelling statement failed: {e}')
+
 
 class DatabaseConnection:
     def __init__(
         self,
         connection,
+        timeouts: OperationTimeouts = OperationTimeouts(),
     ):
         self.connection = connection
+        self.timeouts = timeouts
+        self._statement_timeout = timeouts.statement
+        self._deadline: typing.Optional[float] = None
+        # statement_timeout currently set on the session, None if unknown
+        self._session_statement_timeout_ms: typing.Optional[int] = None
+        # whether the comment_key index exists, None until looked up
+        self._comment_key: typing.Optional[bool] = None
+        # whether the lease table exists, None until looked up
+        self._lease_table: typing.Optional[bool] = None
+        self._watchdog = _Watchdog(cancel=lambda: self.connection.cancel())
         return
 
     def kill(self):
         logger.info('killing database connection')
+        self._watchdog.close()
         self.connection.close()
 
-    def _execute(
+    @property
+    def broken(self) -> bool:
+        # psycopg2 sets closed to non-zero once the connection is closed or lost
+        return bool(self.connection.closed)
+
+    @contextlib.contextmanager
+    def budget(
+        self,
+        timeouts: OperationTimeouts,
+    ):
+        previous = (self._statement_timeout, self._deadline)
+        if timeouts.statement is not None:
+            self._statement_timeout = timeouts.statement
+        if timeouts.total is not None:
+            deadline = time.monotonic() + timeouts.total
+            self._deadline = deadline if self._deadline is None else min(self._deadline, deadline)
+        try:
+            yield self
+        finally:
+            self._statement_timeout, self._deadline = previous
+
+    def _remaining(
         self,
         statement: str,
-        values: tuple,
-        print_exception: bool = True,
+    ) -> typing.Optional[float]:
+        if self._deadline is None:
+            return self.timeouts.total
+        if (remaining := self._deadline - time.monotonic()) <= 0:
+            raise exceptions.OpenmonitorTimeoutError(
+                'database operation budget exhausted',
+                statement=statement,
+            )
+        return remaining
+
+    def _apply_statement_timeout(
+        self,
+        cur,
+        timeout: typing.Optional[float],
     ):
+        timeout_ms = int(timeout * 1000) if timeout is not None else 0
+        if timeout_ms == self._session_statement_timeout_ms:
+            return
+        cur.execute("SET statement_timeout = %s", (timeout_ms,))
+        self._session_statement_timeout_ms = timeout_ms
+
+    def _run(
+        self,
+        statement: str,
+        run: typing.Callable,
+        print_exception: bool,
+    ):
+        remaining = self._remaining(statement=statement)
+        statement_timeout = self._statement_timeout
+        if remaining is not None:
+            statement_timeout = remaining if statement_timeout is None else min(statement_timeout, remaining)
+
         cur = self.connection.cursor(cursor_factory=psycopg2.extras.DictCursor)
 
         try:
-            logger.debug(f'{statement=}')
-            logger.debug(f'{values=}')
-            cur.execute(statement, values)
+            self._apply_statement_timeout(cur=cur, timeout=statement_timeout)
+            # statement_timeout bounds time spent on the server (including lock waits),
+            # the watchdog cancels the backend if the client is stuck for the whole budget
+            if remaining is not None:
+                self._watchdog.arm(timeout=remaining)
+            try:
+                run(cur)
+            finally:
+                self._watchdog.disarm()
+        except psycopg2.extensions.QueryCanceledError as e:
+            cur.execute("rollback")
+            self._session_statement_timeout_ms = None
+            raise exceptions.OpenmonitorTimeoutError(str(e).strip(), statement=statement) from e
         except psycopg2.Error as e:
             if print_exception:
                 logger.error(e)
             cur.execute("rollback")
+            self._session_statement_timeout_ms = None
 
         self.connection.commit()
         return cur
 
+    def _execute(
+        self,
+        statement: str,
+        values: tuple,
+        print_exception: bool = True,
+    ):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'{statement=}')
+            logger.debug(f'{values=}')
+
+        return self._run(
+            statement=statement,
+            run=lambda cur: cur.execute(statement, values),
+            print_exception=print_exception,
+        )
+
+    def _execute_values(
+        self,
+        statement: str,
+        values: typing.List[tuple],
+        print_exception: bool = True,
+    ):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'{statement=}')
+            logger.debug(f'{len(values)=}')
+
+        return self._run(
+            statement=statement,
+            run=lambda cur: psycopg2.extras.execute_values(cur, statement, values),
+            print_exception=print_exception,
+        )
+
+    def _execute_all(
+        self,
+        statements: typing.List[typing.Tuple[str, tuple]],
+        print_exception: bool = True,
+    ):
+        # one transaction, either all statements apply or none
+        if logger.isEnabledFor(logging.DEBUG):
+            for statement, values in statements:
+                logger.debug(f'{statement=}')
+                logger.debug(f'{values=}')
+
+        def run(cur):
+            for statement, values in statements:
+                cur.execute(statement, values)
+
+        return self._run(
+            statement='; '.join(statement for statement, _ in statements),
+            run=run,
+            print_exception=print_exception,
+        )
+
     def insert_system(
         self,
         system: model.System,
@@ -213,6 +430,29 @@ class DatabaseConnection:
             ))
         return results
 
+    def select_latest_results(self) -> typing.List[model.Result]:
+        statement = "SELECT DISTINCT ON (componentId, metricId) * FROM result " \
+                    "ORDER BY componentId, metricId, timestamp DESC"
+
+        cur = self._execute(
+            statement=statement,
+            values=(),
+        )
+
+        try:
+            res = cur.fetchall()
+        except psycopg2.ProgrammingError:
+            return []
+
+        return [model.Result(
+            metricId=r[0],
+            componentId=r[1],
+            value=r[2],
+            timeout=r[3],
+            timestamp=str(r[4]),
+            responseTime=r[5],
+        ) for r in res]
+
     def select_all_comments(self) -> typing.List[model.Comment]:
         statement = "SELECT * FROM comment"
 
@@ -484,16 +724,79 @@ class DatabaseConnection:
     def insert_result(
         self,
         res: model.Result,
-    ):
+        idempotent: bool = False,
+    ) -> bool:
+        # whether the result got stored, False for a skipped duplicate or a failed insert
         statement = "INSERT INTO result " \
                     "VALUES (%s, %s, %s, %s, %s, %s)"
+        if idempotent:
+            statement += " ON CONFLICT DO NOTHING"
 
         values = (dataclasses.astuple(res))
+        inserted = []
 
-        self._execute(
+        def run(cur):
+            cur.execute(statement, values)
+            inserted.append(cur.rowcount > 0)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'{statement=}')
+            logger.debug(f'{values=}')
+
+        self._run(
             statement=statement,
-            values=values,
+            run=run,
+            print_exception=True,
         )
+        return bool(inserted and inserted[0])
+
+    def insert_results(
+        self,
+        results: typing.List[model.Result],
+        idempotent: bool = False,
+    ) -> typing.Optional[typing.List[model.Result]]:
+        # the results actually stored without skipped duplicates, None if the batch failed
+        statement = "INSERT INTO result VALUES %s"
+        if idempotent:
+            statement += " ON CONFLICT DO NOTHING RETURNING *"
+
+        values = [(
+            r.metricId,
+            r.componentId,
+            r.value,
+            r.timeout,
+            r.timestamp,
+            r.responseTime,
+        ) for r in results]
+        inserted: typing.List[typing.List[model.Result]] = []
+
+        def run(cur):
+            rows = psycopg2.extras.execute_values(cur, statement, values, fetch=idempotent)
+            if not idempotent:
+                inserted.append(results)
+                return
+            # built from the stored rows, matching them against the input would depend on
+            # how postgres reads naive timestamps
+            inserted.append([model.Result(
+                metricId=r[0],
+                componentId=r[1],
+                value=r[2],
+                timeout=r[3],
+                timestamp=str(r[4]),
+                responseTime=r[5],
+            ) for r in rows])
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'{statement=}')
+            logger.debug(f'{len(values)=}')
+
+        self._run(
+            statement=statement,
+            run=run,
+            print_exception=True,
+        )
+        # _run rolls back and swallows database errors, run didn't get to record anything then
+        return inserted[0] if inserted else None
 
     def insert_comment(
         self,
@@ -509,6 +812,110 @@ class DatabaseConnection:
             values=values,
         )
 
+    def _has_comment_key(self) -> bool:
+        # the upserts need the comment_key index from create_schema,
+        # databases without it fall back to delete and insert
+        if self._comment_key is None:
+            cur = self._execute(
+                statement="SELECT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'comment_key')",
+                values=(),
+            )
+            self._comment_key = bool(cur.fetchone()[0])
+        return self._comment_key
+
+    def insert_comments(
+        self,
+        comments: typing.List[model.Comment],
+    ):
+        # one row per key, postgres refuses to upsert the same row twice in a statement
+        unique: typing.Dict[tuple, model.Comment] = {}
+        for c in comments:
+            unique[(c.metricId, c.componentId, _comment_timestamp_key(c.timestamp))] = c
+
+        values = [(
+            c.metricId,
+            c.componentId,
+            c.comment,
+            c.timestamp,
+            c.startTimestamp,
+            c.endTimestamp,
+        ) for c in unique.values()]
+        if not values:
+            return
+
+        if self._has_comment_key():
+            self._execute_values(
+                statement=f"INSERT INTO comment VALUES %s {_UPSERT_COMMENT}",
+                values=values,
+            )
+            return
+
+        statement = "DELETE FROM comment WHERE (metricId, componentId, timestamp) IN %s"
+        keys = tuple((c.metricId, c.componentId, c.timestamp) for c in unique.values())
+
+        def run(cur):
+            cur.execute(statement, (keys,))
+            psycopg2.extras.execute_values(cur, "INSERT INTO comment VALUES %s", values)
+
+        self._run(
+            statement=statement,
+            run=run,
+            print_exception=True,
+        )
+
+    def close_comments(
+        self,
+        end_timestamp: str,
+        component_ids: typing.Optional[typing.List[str]] = None,
+        metric_ids: typing.Optional[typing.List[str]] = None,
+    ) -> int:
+        statement = "UPDATE comment SET endTimestamp = %s " \
+                    "WHERE endTimestamp IS NULL"
+        values = [end_timestamp]
+
+        if component_ids is not None:
+            statement += " AND componentId = ANY(%s)"
+            values.append(list(component_ids))
+        if metric_ids is not None:
+            statement += " AND metricId = ANY(%s)"
+            values.append(list(metric_ids))
+
+        cur = self._execute(
+            statement=statement,
+            values=tuple(values),
+        )
+        return cur.rowcount
+
+    def upsert_comment(
+        self,
+        old: model.Comment,
+        new: model.Comment,
+    ):
+        moved = (old.metricId, old.componentId, old.timestamp) != (new.metricId, new.componentId, new.timestamp)
+        values = dataclasses.astuple(new)
+
+        if not self._has_comment_key():
+            statements = [("INSERT INTO comment VALUES (%s, %s, %s, %s, %s, %s)", values)]
+            delete = "DELETE FROM comment WHERE metricId = %s AND componentId = %s AND timestamp = %s"
+            statements.insert(0, (delete, (new.metricId, new.componentId, new.timestamp)))
+            if moved:
+                statements.insert(0, (delete, (old.metricId, old.componentId, old.timestamp)))
+            self._execute_all(statements=statements)
+            return
+
+        statement = f"INSERT INTO comment VALUES (%s, %s, %s, %s, %s, %s) {_UPSERT_COMMENT}"
+
+        # a moved key deletes the old row within the same statement
+        if moved:
+            statement = "WITH deleted AS (DELETE FROM comment " \
+                        "WHERE metricId = %s AND componentId = %s AND timestamp = %s) " + statement
+            values = (old.metricId, old.componentId, old.timestamp) + values
+
+        self._execute(
+            statement=statement,
+            values=values,
+        )
+
     def delete_outdated_results(
         self,
         interval: str,
@@ -521,3 +928,307 @@ class DatabaseConnection:
             statement=stmt,
             values=values,
         )
+
+    def select_cutoff(
+        self,
+        interval: str,
+    ):
+        statement = "SELECT NOW() - INTERVAL %s"
+        values = (interval,)
+
+        cur = self._execute(
+            statement=statement,
+            values=values,
+        )
+
+        if not (res := cur.fetchone()):
+            return None
+        return res[0]
+
+    def select_results_before(
+        self,
+        component_id: str,
+        metric_id: str,
+        cutoff,
+    ) -> typing.List[model.Result]:
+        statement = "SELECT * FROM result " \
+                    "WHERE componentId = %s AND metricId = %s AND timestamp < %s " \
+                    "ORDER BY timestamp"
+        values = (component_id, metric_id, cutoff)
+
+        cur = self._execute(
+            statement=statement,
+            values=values,
+        )
+
+        try:
+            res = cur.fetchall()
+        except TypeError:
+            return []
+
+        return [model.Result(
+            metricId=r[0],
+            componentId=r[1],
+            value=r[2],
+            timeout=r[3],
+            timestamp=str(r[4]),
+            responseTime=r[5],
+        ) for r in res]
+
+    def delete_results_before(
+        self,
+        component_id: str,
+        metric_id: str,
+        cutoff,
+    ):
+        statement = "DELETE FROM result " \
+                    "WHERE componentId = %s AND metricId = %s AND timestamp < %s"
+        values = (component_id, metric_id, cutoff)
+
+        self._execute(
+            statement=statement,
+            values=values,
+        )
+
+    def refresh_sla_checkpoints(
+        self,
+        since=None,
+        grace: str = '0',
+    ):
+        # hours are checkpointed once closed for longer than grace, results flushed shortly
+        # after the hour still make it in; later hours are aggregated live.
+        # buckets are hours in UTC, matching SlaEngine
+        statement = "INSERT INTO sla_checkpoint " \
+                    "SELECT r.componentId, r.metricId, date_trunc('hour', r.timestamp, 'UTC') AS bucket, " \
+                    f"{_SLA_COLUMNS} " \
+                    "FROM result r JOIN metric m ON m.componentId = r.componentId AND m.id = r.metricId " \
+                    "WHERE r.timestamp >= COALESCE(%s, " \
+                    "(SELECT MAX(bucket) + INTERVAL '1 hour' FROM sla_checkpoint), '-infinity') " \
+                    "AND r.timestamp < date_trunc('hour', NOW() - INTERVAL %s, 'UTC') " \
+                    f"AND {_NOT_COMMENTED} " \
+                    "GROUP BY r.componentId, r.metricId, bucket " \
+                    "ON CONFLICT (componentId, metricId, bucket) DO UPDATE SET " \
+                    "total = EXCLUDED.total, timeouts = EXCLUDED.timeouts, " \
+                    "withinSlo = EXCLUDED.withinSlo, responseTimeSum = EXCLUDED.responseTimeSum"
+        statements = [(statement, (since, grace))]
+
+        if since is not None:
+            # a metric-hour now fully inside a comment has no rows left to upsert,
+            # its old checkpoint has to go as well
+            statements.insert(0, ("DELETE FROM sla_checkpoint WHERE bucket >= %s", (since,)))
+
+        self._execute_all(statements=statements)
+
+    def select_sla_frontier(self):
+        statement = "SELECT MAX(bucket) + INTERVAL '1 hour' FROM sla_checkpoint"
+
+        cur = self._execute(
+            statement=statement,
+            values=(),
+        )
+
+        if not (res := cur.fetchone()):
+            return None
+        return res[0]
+
+    def select_sla_aggregates(
+        self,
+        start,
+        end,
+        checkpoint_start,
+        checkpoint_end,
+    ) -> typing.List[tuple]:
+        # checkpoints cover [checkpoint_start, checkpoint_end), raw results the edges.
+        # the raw scans use the result_key index (componentId, metricId, timestamp) from create_schema
+        statement = "SELECT x.componentId, x.metricId, c.system, " \
+                    "SUM(x.total), SUM(x.timeouts), SUM(x.withinSlo), SUM(x.responseTimeSum) " \
+                    "FROM (" \
+                    "SELECT componentId, metricId, total, timeouts, withinSlo, responseTimeSum " \
+                    "FROM sla_checkpoint WHERE bucket >= %s AND bucket < %s " \
+                    "UNION ALL " \
+                    f"SELECT r.componentId, r.metricId, {_SLA_COLUMNS} " \
+                    "FROM result r JOIN metric m ON m.componentId = r.componentId AND m.id = r.metricId " \
+                    "WHERE ((r.timestamp >= %s AND r.timestamp < %s) " \
+                    "OR (r.timestamp >= %s AND r.timestamp < %s)) " \
+                    f"AND {_NOT_COMMENTED} " \
+                    "GROUP BY r.componentId, r.metricId" \
+                    ") x JOIN component c ON c.id = x.componentId " \
+                    "GROUP BY x.componentId, x.metricId, c.system"
+        values = (
+            checkpoint_start, checkpoint_end,
+            start, checkpoint_start,
+            checkpoint_end, end,
+        )
+
+        cur = self._execute(
+            statement=statement,
+            values=values,
+        )
+
+        try:
+            return [tuple(r) for r in cur.fetchall()]
+        except psycopg2.ProgrammingError:
+            return []
+
+    def select_replication_lag(self) -> typing.Optional[float]:
+        statement = "SELECT CASE WHEN pg_is_in_recovery() " \
+                    "THEN EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()) " \
+                    "ELSE 0 END"
+
+        cur = self._execute(
+            statement=statement,
+            values=(),
+        )
+
+        if not (res := cur.fetchone()) or res[0] is None:
+            return None
+        return float(res[0])
+
+    def create_schema(self):
+        for statement in schema.STATEMENTS:
+            self._execute(
+                statement=statement,
+                values=(),
+            )
+        self._comment_key = None
+        self._lease_table = None
+
+    def _has_lease_table(self) -> bool:
+        if self._lease_table is None:
+            cur = self._execute(
+                statement="SELECT to_regclass('lease') IS NOT NULL",
+                values=(),
+            )
+            self._lease_table = bool(cur.fetchone()[0])
+        return self._lease_table
+
+    def sync_leases(self):
+        # deployments without lease based ownership never created the table
+        if not self._has_lease_table():
+            return
+
+        statement = "INSERT INTO lease (componentId, metricId) " \
+                    "SELECT componentId, id FROM metric " \
+                    "ON CONFLICT DO NOTHING"
+
+        self._execute(
+            statement=statement,
+            values=(),
+        )
+
+        statement = "DELETE FROM lease l " \
+                    "WHERE NOT EXISTS (SELECT 1 FROM metric m " \
+                    "WHERE m.componentId = l.componentId AND m.id = l.metricId)"
+
+        self._execute(
+            statement=statement,
+            values=(),
+        )
+
+    def acquire_leases(
+        self,
+        owner: str,
+        ttl: str,
+        limit: int,
+    ) -> typing.List[typing.Tuple[str, str]]:
+        # SKIP LOCKED lets concurrent nodes grab disjoint sets in one round-trip
+        statement = "UPDATE lease SET owner = %s, expires = NOW() + INTERVAL %s " \
+                    "WHERE (componentId, metricId) IN (" \
+                    "SELECT componentId, metricId FROM lease " \
+                    "WHERE owner IS NULL OR expires < NOW() " \
+                    "ORDER BY componentId, metricId LIMIT %s " \
+                    "FOR UPDATE SKIP LOCKED) " \
+                    "RETURNING componentId, metricId"
+        values = (owner, ttl, limit)
+
+        cur = self._execute(
+            statement=statement,
+            values=values,
+        )
+
+        try:
+            return [(r[0], r[1]) for r in cur.fetchall()]
+        except psycopg2.ProgrammingError:
+            return []
+
+    def renew_leases(
+        self,
+        owner: str,
+        ttl: str,
+    ) -> typing.List[typing.Tuple[str, str]]:
+        statement = "UPDATE lease SET expires = NOW() + INTERVAL %s " \
+                    "WHERE owner = %s " \
+                    "RETURNING componentId, metricId"
+        values = (ttl, owner)
+
+        cur = self._execute(
+            statement=statement,
+            values=values,
+        )
+
+        try:
+            return [(r[0], r[1]) for r in cur.fetchall()]
+        except psycopg2.ProgrammingError:
+            return []
+
+    def release_leases(
+        self,
+        owner: str,
+        leases: typing.Optional[typing.List[typing.Tuple[str, str]]] = None,
+    ):
+        statement = "UPDATE lease SET owner = NULL, expires = '-infinity' " \
+                    "WHERE owner = %s"
+        values = (owner,)
+
+        if leases is not None:
+            if not leases:
+                return
+            statement += " AND (componentId, metricId) IN %s"
+            values = (owner, tuple(leases))
+
+        self._execute(
+            statement=statement,
+            values=values,
+        )
+
+    def register_lease_owner(
+        self,
+        owner: str,
+        ttl: str,
+    ):
+        # expired owners are dropped along the way
+        statement = "WITH expired AS (DELETE FROM lease_owner WHERE expires < NOW()) " \
+                    "INSERT INTO lease_owner (owner, expires) VALUES (%s, NOW() + INTERVAL %s) " \
+                    "ON CONFLICT (owner) DO UPDATE SET expires = EXCLUDED.expires"
+        values = (owner, ttl)
+
+        self._execute(
+            statement=statement,
+            values=values,
+        )
+
+    def deregister_lease_owner(
+        self,
+        owner: str,
+    ):
+        statement = "DELETE FROM lease_owner " \
+                    "WHERE owner = %s"
+        values = (owner,)
+
+        self._execute(
+            statement=statement,
+            values=values,
+        )
+
+    def select_lease_stats(self) -> typing.Tuple[int, int]:
+        statement = "SELECT (SELECT COUNT(*) FROM lease), " \
+                    "(SELECT COUNT(*) FROM lease_owner WHERE expires >= NOW())"
+
+        cur = self._execute(
+            statement=statement,
+            values=(),
+        )
+
+        if not (res := cur.fetchone()):
+            return 0, 0
+        return res[0], res[1]
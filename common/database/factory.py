@@ -1,11 +1,14 @@
 import logging
 import os
 import time
-
-import psycopg2
-import psycopg2.extras
+import typing
 
 from . import connection
+from . import routing
+import common.exceptions as exceptions
+import common.util as commonutil
+
+psycopg2 = commonutil.lazy_import('psycopg2')
 
 
 logger = logging.getLogger(__name__)
@@ -18,27 +21,92 @@ class DatabaseConnectionFactory:
         user=os.getenv('DBUSER'),
         password=os.getenv('DBPASSWD'),
         host=os.getenv('DBHOST'),
-        port=int(os.getenv('DBPORT')),
+        port=os.getenv('DBPORT'),
+        replicas: typing.Optional[typing.List[str]] = None,
+        timeouts: typing.Optional[connection.OperationTimeouts] = None,
+        retry_timeout: typing.Optional[float] = None,
     ):
         self.database = database
         self.user = user
         self.password = password
         self.host = host
-        self.port = port
+        self.port = int(port) if port else port
+        # 'host:port' entries, e.g. DBREPLICAS=replica-0:5432,replica-1:5432
+        if replicas is None:
+            replicas = [r for r in os.getenv('DBREPLICAS', '').split(',') if r]
+        self.replicas = replicas
+        # seconds, e.g. DBCONNECTTIMEOUT=5 DBSTATEMENTTIMEOUT=30; unset or 0 disables
+        if timeouts is None:
+            timeouts = connection.OperationTimeouts(
+                connect=float(os.getenv('DBCONNECTTIMEOUT') or 0) or None,
+                statement=float(os.getenv('DBSTATEMENTTIMEOUT') or 0) or None,
+            )
+        self.timeouts = timeouts
+        # give up reconnecting after retry_timeout seconds, None retries forever
+        self.retry_timeout = retry_timeout
         return
 
+    def _connect(
+        self,
+        host,
+        port,
+    ) -> connection.DatabaseConnection:
+        kwargs = {}
+        if self.timeouts.connect is not None:
+            # libpq only takes whole seconds, and treats values below 2 as 2
+            kwargs['connect_timeout'] = max(int(self.timeouts.connect), 1)
+        return connection.DatabaseConnection(
+            psycopg2.connect(
+                database=self.database,
+                user=self.user,
+                password=self.password,
+                host=host,
+                port=port,
+                **kwargs,
+            ),
+            timeouts=self.timeouts,
+        )
+
     def make_connection(self):
         logger.debug('making database connection')
+        started = time.monotonic()
         while True:
             try:
-                return connection.DatabaseConnection(
-                    psycopg2.connect(
-                        database=self.database,
-                        user=self.user,
-                        password=self.password,
-                        host=self.host,
-                        port=self.port,
-                ))
-            except psycopg2.OperationalError:
+                return self._connect(host=self.host, port=self.port)
+            except psycopg2.OperationalError as e:
+                if self.retry_timeout is not None and time.monotonic() - started + 3 > self.retry_timeout:
+                    raise exceptions.OpenmonitorTimeoutError(
+                        f'unable to connect to database within {self.retry_timeout}s',
+                    ) from e
                 logger.warn('unable to connect to database, retry in 3 seconds...')
                 time.sleep(3)
+
+    def make_read_connection(
+        self,
+        primary: typing.Optional[connection.DatabaseConnection] = None,
+        strategy: str = routing.ROUND_ROBIN,
+        max_lag: typing.Optional[float] = None,
+    ):
+        primary = primary or self.make_connection()
+        if not self.replicas:
+            return primary
+
+        replicas: typing.List[connection.DatabaseConnection] = []
+        addresses: typing.List[typing.Tuple[str, int]] = []
+        for replica in self.replicas:
+            host, _, port = replica.partition(':')
+            address = (host, int(port) if port else self.port)
+            try:
+                replicas.append(self._connect(host=address[0], port=address[1]))
+                addresses.append(address)
+            except psycopg2.OperationalError:
+                # an unreachable replica must not block startup, reads fall back to the primary
+                logger.warn(f'unable to connect to replica {replica}, skipping')
+
+        return routing.ReplicaRouter(
+            primary=primary,
+            replicas=replicas,
+            strategy=strategy,
+            max_lag=max_lag,
+            reconnect=lambda i: self._connect(host=addresses[i][0], port=addresses[i][1]),
+        )
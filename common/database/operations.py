@@ -1,18 +1,81 @@
+import contextlib
+import functools
 import logging
+import typing
 
 from . import connection
+import common.archive as archive
 import common.model as model
 
 
+def _budgeted(func):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not (timeouts := self.timeouts.get(func.__name__)):
+            return func(self, *args, **kwargs)
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(self.connection.budget(timeouts=timeouts))
+            if self.read_connection is not self.connection:
+                stack.enter_context(self.read_connection.budget(timeouts=timeouts))
+            return func(self, *args, **kwargs)
+    return wrapper
+
+
 class DatabaseOperator:
     def __init__(
         self,
         connection: connection.DatabaseConnection,
+        result_listeners: typing.Optional[typing.List[typing.Callable[[model.Result], None]]] = None,
+        read_connection=None,
+        timeouts: typing.Optional[typing.Dict[str, connection.OperationTimeouts]] = None,
+        idempotent: bool = False,
     ):
         self.connection = connection
+        # read-only lookups may go to replicas, anything feeding a write stays on the primary
+        self.read_connection = read_connection or connection
+        # per operation budgets keyed by method name, e.g. {'select_all_results': ...}
+        self.timeouts = timeouts or {}
+        # skip results whose (componentId, metricId, timestamp) is already stored,
+        # makes retried and replayed writes safe (requires create_schema)
+        self.idempotent = idempotent
+        self.result_listeners = list(result_listeners or ())
+        # called with all systems and components after insert_config, e.g. HealthTree.update_config
+        self.config_listeners: typing.List[
+            typing.Callable[[typing.List[model.System], typing.List[model.Component]], None]
+        ] = []
         self.logger = logging.getLogger(__name__)
         return
 
+    def add_result_listener(
+        self,
+        listener: typing.Callable[[model.Result], None],
+    ):
+        self.result_listeners.append(listener)
+
+    def add_config_listener(
+        self,
+        listener: typing.Callable[[typing.List[model.System], typing.List[model.Component]], None],
+    ):
+        self.config_listeners.append(listener)
+
+    def _notify_config_listeners(self):
+        if not self.config_listeners:
+            return
+        # read back from the primary, a replica may not have the new config yet
+        systems = self.connection.select_all_systems() or []
+        components = self.connection.select_all_components() or []
+        for listener in self.config_listeners:
+            listener(systems, components)
+
+    def _notify_result_listeners(
+        self,
+        results: typing.Iterable[model.Result],
+    ):
+        for listener in self.result_listeners:
+            for res in results:
+                listener(res)
+
+    @_budgeted
     def insert_config(
         self,
         cfg: model.Config,
@@ -56,12 +119,31 @@ class DatabaseOperator:
             for m in c.metrics:
                 self.connection.insert_metric(metric=m, component_id=c.id,)
 
+        # one lease row per metric, whichever node loads the config
+        self.connection.sync_leases()
+        self._notify_config_listeners()
+
+    @_budgeted
     def insert_result(
         self,
         res: model.Result,
     ):
-        self.connection.insert_result(res=res)
+        # listeners only see what got stored, replayed duplicates and failed writes are skipped
+        if self.connection.insert_result(res=res, idempotent=self.idempotent):
+            self._notify_result_listeners(results=(res,))
+
+    @_budgeted
+    def insert_results(
+        self,
+        results: typing.List[model.Result],
+    ) -> typing.Optional[typing.List[model.Result]]:
+        # the stored results, None if the database rejected the batch
+        stored = self.connection.insert_results(results=results, idempotent=self.idempotent)
+        if stored is not None:
+            self._notify_result_listeners(results=stored)
+        return stored
 
+    @_budgeted
     def insert_comment(
         self,
         comment: model.Comment,
@@ -69,26 +151,37 @@ class DatabaseOperator:
         self.connection.insert_comment(comment=comment)
 
 
+    @_budgeted
     def select_all_components(
         self,
     ):
-        return self.connection.select_all_components()
+        return self.read_connection.select_all_components()
 
+    @_budgeted
     def select_all_systems(
         self,
     ):
-        return self.connection.select_all_systems()
+        return self.read_connection.select_all_systems()
 
+    @_budgeted
     def select_all_results(
         self,
     ):
-        return self.connection.select_all_results()
+        return self.read_connection.select_all_results()
 
+    @_budgeted
+    def select_latest_results(
+        self,
+    ):
+        return self.read_connection.select_latest_results()
+
+    @_budgeted
     def select_all_comments(
         self,
     ):
-        return self.connection.select_all_comments()
+        return self.read_connection.select_all_comments()
 
+    @_budgeted
     def delete_outdated_results(
         self,
         component_id: str,
@@ -97,18 +190,61 @@ class DatabaseOperator:
     ):
         self.connection.delete_outdated_results(delete_after.as_interval())
 
+    @_budgeted
+    def archive_outdated_results(
+        self,
+        directory: str,
+    ) -> typing.List[str]:
+        segments: typing.List[str] = []
+        for c in self.select_all_components() or ():
+            for m in c.metrics or ():
+                # pin the cutoff so rows arriving meanwhile are neither archived nor deleted
+                cutoff = self.connection.select_cutoff(interval=m.deleteAfter.as_interval())
+                results = self.connection.select_results_before(
+                    component_id=c.id,
+                    metric_id=m.id,
+                    cutoff=cutoff,
+                )
+                if not results:
+                    continue
+                segments.append(archive.write_segment(directory=directory, results=results))
+                self.logger.debug(f'archived {len(results)} results of {c.id=} {m.id=}')
+                self.connection.delete_results_before(
+                    component_id=c.id,
+                    metric_id=m.id,
+                    cutoff=cutoff,
+                )
+        return segments
+
+    @_budgeted
     def update_comment(
         self,
         old: model.Comment,
         new: model.Comment,
     ):
-        self.connection.delete_comment(
-            metric_id=old.metricId,
-            component_id=old.componentId,
-            timestamp=old.timestamp,
+        self.connection.upsert_comment(old=old, new=new)
+
+    @_budgeted
+    def insert_comments(
+        self,
+        comments: typing.List[model.Comment],
+    ):
+        self.connection.insert_comments(comments=comments)
+
+    @_budgeted
+    def close_comments(
+        self,
+        end_timestamp: str,
+        component_ids: typing.Optional[typing.List[str]] = None,
+        metric_ids: typing.Optional[typing.List[str]] = None,
+    ) -> int:
+        return self.connection.close_comments(
+            end_timestamp=end_timestamp,
+            component_ids=component_ids,
+            metric_ids=metric_ids,
         )
-        self.connection.insert_comment(comment=new)
 
+    @_budgeted
     def delete_comment(
         self,
         component_id: str,
@@ -121,40 +257,147 @@ class DatabaseOperator:
             timestamp=timestamp,
         )
 
+    @_budgeted
     def select_comment(
         self,
         component_id: str,
         metric_id: str,
         timestamp: str,
     ):
-        return self.connection.select_comment(
+        return self.read_connection.select_comment(
             component_id=component_id,
             metric_id=metric_id,
             timestamp=timestamp,
         )
 
+    @_budgeted
     def select_metric(
         self,
         component_id: str,
         metric_id: str,
     ) -> model.Metric:
-        return self.connection.select_metric(
+        return self.read_connection.select_metric(
             component_id=component_id,
             metric_id=metric_id,
         )
 
+    @_budgeted
     def select_component(
         self,
         component_id: str,
     ):
-        return self.connection.select_component(component_id=component_id)
+        return self.read_connection.select_component(component_id=component_id)
 
+    @_budgeted
     def select_metric(
         self,
         component_id: str,
         metric_id: str,
     ) -> model.Metric:
-        return self.connection.select_metric(
+        return self.read_connection.select_metric(
             component_id=component_id,
             metric_id=metric_id,
         )
+
+    @_budgeted
+    def create_schema(
+        self,
+    ):
+        self.connection.create_schema()
+
+    @_budgeted
+    def sync_leases(
+        self,
+    ):
+        self.connection.sync_leases()
+
+    @_budgeted
+    def acquire_leases(
+        self,
+        owner: str,
+        ttl: model.TimeDetail,
+        limit: int,
+    ) -> typing.List[typing.Tuple[str, str]]:
+        return self.connection.acquire_leases(
+            owner=owner,
+            ttl=ttl.as_interval(),
+            limit=limit,
+        )
+
+    @_budgeted
+    def renew_leases(
+        self,
+        owner: str,
+        ttl: model.TimeDetail,
+    ) -> typing.List[typing.Tuple[str, str]]:
+        return self.connection.renew_leases(
+            owner=owner,
+            ttl=ttl.as_interval(),
+        )
+
+    @_budgeted
+    def release_leases(
+        self,
+        owner: str,
+        leases: typing.Optional[typing.List[typing.Tuple[str, str]]] = None,
+    ):
+        self.connection.release_leases(
+            owner=owner,
+            leases=leases,
+        )
+
+    @_budgeted
+    def register_lease_owner(
+        self,
+        owner: str,
+        ttl: model.TimeDetail,
+    ):
+        self.connection.register_lease_owner(
+            owner=owner,
+            ttl=ttl.as_interval(),
+        )
+
+    @_budgeted
+    def deregister_lease_owner(
+        self,
+        owner: str,
+    ):
+        self.connection.deregister_lease_owner(owner=owner)
+
+    @_budgeted
+    def select_lease_stats(
+        self,
+    ) -> typing.Tuple[int, int]:
+        return self.connection.select_lease_stats()
+
+    @_budgeted
+    def refresh_sla_checkpoints(
+        self,
+        since=None,
+        grace: typing.Optional[model.TimeDetail] = None,
+    ):
+        self.connection.refresh_sla_checkpoints(
+            since=since,
+            grace=grace.as_interval() if grace else '0',
+        )
+
+    @_budgeted
+    def select_sla_frontier(
+        self,
+    ):
+        return self.read_connection.select_sla_frontier()
+
+    @_budgeted
+    def select_sla_aggregates(
+        self,
+        start,
+        end,
+        checkpoint_start,
+        checkpoint_end,
+    ) -> typing.List[tuple]:
+        return self.read_connection.select_sla_aggregates(
+            start=start,
+            end=end,
+            checkpoint_start=checkpoint_start,
+            checkpoint_end=checkpoint_end,
+        )
@@ -0,0 +1,187 @@
+import contextlib
+import itertools
+import logging
+import threading
+import time
+import typing
+
+from . import connection
+import common.exceptions as exceptions
+
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = 'round-robin'
+LEAST_LATENCY = 'least-latency'
+
+# DatabaseConnection methods a replica may serve, everything else goes to the primary
+READ_METHODS = frozenset({
+    'select_system',
+    'select_all_systems',
+    'select_all_components',
+    'select_all_results',
+    'select_latest_results',
+    'select_all_comments',
+    'select_comment',
+    'select_metric',
+    'select_component',
+    'select_component_from_system_id',
+    'select_metrics_from_component',
+    'select_sla_frontier',
+    'select_sla_aggregates',
+})
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        primary: connection.DatabaseConnection,
+        replicas: typing.List[connection.DatabaseConnection],
+        strategy: str = ROUND_ROBIN,
+        max_lag: typing.Optional[float] = None,
+        lag_check_interval: float = 5.0,
+        latency_alpha: float = 0.2,
+        reconnect: typing.Optional[typing.Callable[[int], connection.DatabaseConnection]] = None,
+        retry_interval: float = 30.0,
+    ):
+        if strategy not in (ROUND_ROBIN, LEAST_LATENCY):
+            raise exceptions.OpenmonitorNotSupported(f'unknown replica selection strategy {strategy!r}')
+        self.primary = primary
+        self.replicas = replicas
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.latency_alpha = latency_alpha
+        # replaces a broken replica connection, tried every retry_interval seconds
+        self.reconnect = reconnect
+        self.retry_interval = retry_interval
+        # ewma of call latency in seconds, untried replicas start at 0 and get probed first
+        self.latencies = [0.0] * len(replicas)
+        self._within_lag = [True] * len(replicas)
+        # monotonic time a replica broke, None while healthy
+        self._failed: typing.List[typing.Optional[float]] = [None] * len(replicas)
+        # replica index -> thread reconnecting it
+        self._reconnecting: typing.Dict[int, threading.Thread] = {}
+        self._lag_checked = float('-inf')
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        return
+
+    def _fail(
+        self,
+        idx: int,
+        error: Exception,
+    ):
+        logger.warning(f'replica {idx} failed, routing its reads to the primary: {error}')
+        self._failed[idx] = time.monotonic()
+
+    def _recover(self):
+        # connecting may take up to the connect timeout, it happens in the background
+        # so neither the lock nor the read that noticed it are held up
+        now = time.monotonic()
+        for i, failed in enumerate(self._failed):
+            if failed is None or not self.reconnect or i in self._reconnecting:
+                continue
+            if now - failed < self.retry_interval:
+                continue
+            thread = threading.Thread(
+                target=self._reconnect,
+                args=(i,),
+                name=f'replica-reconnect-{i}',
+                daemon=True,
+            )
+            self._reconnecting[i] = thread
+            thread.start()
+
+    def _reconnect(
+        self,
+        idx: int,
+    ):
+        try:
+            replica = self.reconnect(idx)
+        except Exception as e:
+            logger.debug(f'replica {idx} still unavailable: {e}')
+            with self._lock:
+                self._failed[idx] = time.monotonic()
+                del self._reconnecting[idx]
+            return
+        with self._lock:
+            broken, self.replicas[idx] = self.replicas[idx], replica
+            self._failed[idx] = None
+            del self._reconnecting[idx]
+        broken.kill()
+        logger.info(f'replica {idx} reconnected')
+
+    def _check_lag(self):
+        for i, replica in enumerate(self.replicas):
+            if self._failed[i] is not None:
+                continue
+            try:
+                lag = replica.select_replication_lag()
+            except Exception as e:
+                if replica.broken:
+                    self._fail(idx=i, error=e)
+                lag = None
+            self._within_lag[i] = lag is not None and lag <= self.max_lag
+            if not self._within_lag[i]:
+                logger.debug(f'replica {i} lagging behind ({lag=}), not routing reads to it')
+        self._lag_checked = time.monotonic()
+
+    def select(self) -> typing.Tuple[typing.Optional[int], connection.DatabaseConnection]:
+        with self._lock:
+            self._recover()
+            if self.max_lag is not None and time.monotonic() - self._lag_checked >= self.lag_check_interval:
+                self._check_lag()
+            eligible = [
+                i for i in range(len(self.replicas))
+                if self._within_lag[i] and self._failed[i] is None
+            ]
+
+        if not eligible:
+            return None, self.primary
+        if self.strategy == LEAST_LATENCY:
+            idx = min(eligible, key=lambda i: self.latencies[i])
+        else:
+            idx = eligible[next(self._counter) % len(eligible)]
+        return idx, self.replicas[idx]
+
+    def __getattr__(self, name):
+        attr = getattr(self.primary, name)
+        if name not in READ_METHODS:
+            return attr
+
+        def routed(*args, **kwargs):
+            idx, conn = self.select()
+            if idx is None:
+                return attr(*args, **kwargs)
+
+            start = time.monotonic()
+            try:
+                res = getattr(conn, name)(*args, **kwargs)
+            except Exception as e:
+                # errors of a healthy connection are the caller's, a lost one falls back
+                if not conn.broken:
+                    raise
+                with self._lock:
+                    self._fail(idx=idx, error=e)
+                return attr(*args, **kwargs)
+            self.latencies[idx] += self.latency_alpha * (time.monotonic() - start - self.latencies[idx])
+            return res
+
+        return routed
+
+    @contextlib.contextmanager
+    def budget(
+        self,
+        timeouts: connection.OperationTimeouts,
+    ):
+        # the budget has to hold whichever connection a call gets routed to
+        with contextlib.ExitStack() as stack:
+            for conn in [self.primary] + self.replicas:
+                stack.enter_context(conn.budget(timeouts=timeouts))
+            yield self
+
+    def kill(self):
+        for replica in self.replicas:
+            replica.kill()
+        self.primary.kill()
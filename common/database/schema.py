@@ -0,0 +1,53 @@
+# tables not managed by the monitor deployment itself, created idempotently
+# via DatabaseConnection.create_schema
+
+LEASE_TABLE = "CREATE TABLE IF NOT EXISTS lease (" \
+              "componentId TEXT NOT NULL, " \
+              "metricId TEXT NOT NULL, " \
+              "owner TEXT, " \
+              "expires TIMESTAMPTZ NOT NULL DEFAULT '-infinity', " \
+              "PRIMARY KEY (componentId, metricId))"
+
+# live nodes, counted for the fair share whether they hold leases yet or not
+LEASE_OWNER_TABLE = "CREATE TABLE IF NOT EXISTS lease_owner (" \
+                    "owner TEXT PRIMARY KEY, " \
+                    "expires TIMESTAMPTZ NOT NULL)"
+
+SLA_CHECKPOINT_TABLE = "CREATE TABLE IF NOT EXISTS sla_checkpoint (" \
+                       "componentId TEXT NOT NULL, " \
+                       "metricId TEXT NOT NULL, " \
+                       "bucket TIMESTAMPTZ NOT NULL, " \
+                       "total BIGINT NOT NULL, " \
+                       "timeouts BIGINT NOT NULL, " \
+                       "withinSlo BIGINT NOT NULL, " \
+                       "responseTimeSum BIGINT NOT NULL, " \
+                       "PRIMARY KEY (componentId, metricId, bucket))"
+
+# natural key of a result, also serves the per metric range scans.
+# duplicates written before the key existed are dropped first, keeping one row each
+RESULT_DEDUPLICATE = "DELETE FROM result a USING result b " \
+                     "WHERE a.ctid < b.ctid AND a.componentId = b.componentId " \
+                     "AND a.metricId = b.metricId AND a.timestamp = b.timestamp " \
+                     "AND NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'result_key')"
+
+RESULT_KEY_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS result_key " \
+                   "ON result (componentId, metricId, timestamp)"
+
+# natural key of a comment, used by the ON CONFLICT upserts; duplicates go first as for results
+COMMENT_DEDUPLICATE = "DELETE FROM comment a USING comment b " \
+                      "WHERE a.ctid < b.ctid AND a.metricId = b.metricId " \
+                      "AND a.componentId = b.componentId AND a.timestamp = b.timestamp " \
+                      "AND NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'comment_key')"
+
+COMMENT_KEY_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS comment_key " \
+                    "ON comment (metricId, componentId, timestamp)"
+
+STATEMENTS = (
+    LEASE_TABLE,
+    LEASE_OWNER_TABLE,
+    SLA_CHECKPOINT_TABLE,
+    RESULT_DEDUPLICATE,
+    RESULT_KEY_INDEX,
+    COMMENT_DEDUPLICATE,
+    COMMENT_KEY_INDEX,
+)
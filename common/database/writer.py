@@ -0,0 +1,63 @@
+import logging
+import time
+import typing
+
+from . import operations
+import common.model as model
+
+
+logger = logging.getLogger(__name__)
+
+
+class ResultWriter:
+    def __init__(
+        self,
+        operator: operations.DatabaseOperator,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+    ):
+        self.operator = operator
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # keyed by the result's natural key, a retried probe doesn't end up twice in a batch
+        self._buffer: typing.Dict[typing.Tuple[str, str, str], model.Result] = {}
+        self._last_flush = time.monotonic()
+        return
+
+    def write(
+        self,
+        res: model.Result,
+    ):
+        self._buffer.setdefault((res.componentId, res.metricId, res.timestamp), res)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        logger.debug(f'flushing {len(self._buffer)} results')
+        if self.operator.insert_results(results=list(self._buffer.values())) is not None:
+            self._buffer = {}
+            return
+        # a single bad row makes postgres reject the whole statement, retry the rows one by one
+        self._buffer = self._insert_each()
+
+    def _insert_each(self) -> typing.Dict[typing.Tuple[str, str, str], model.Result]:
+        failed = {}
+        for key, res in self._buffer.items():
+            if self.operator.insert_results(results=[res]) is None:
+                failed[key] = res
+        if len(failed) == len(self._buffer):
+            # nothing got through, the database is likely unavailable, retry with the next flush
+            logger.warning(f'inserting results failed, keeping {len(failed)} results buffered')
+            return failed
+        if failed:
+            logger.error(f'dropping {len(failed)} results rejected by the database: {list(failed)}')
+        return {}
@@ -17,4 +17,13 @@ class OpenmonitorNotSupported(OpenmonitorError):
         **kwargs,
     ):
         super().__init__(*args)
-        self.time_str = kwargs.get('time_str')
\ No newline at end of file
+        self.time_str = kwargs.get('time_str')
+
+class OpenmonitorTimeoutError(OpenmonitorError):
+    def __init__(
+        self,
+        *args,
+        **kwargs,
+    ):
+        super().__init__(*args)
+        self.statement = kwargs.get('statement')
@@ -0,0 +1,204 @@
+import datetime
+import logging
+import threading
+import typing
+
+from . import model
+from . import util
+import common.database.operations as operations
+
+
+logger = logging.getLogger(__name__)
+
+MetricKey = typing.Tuple[str, str]
+
+# ascending severity, a parent reports the worst status among its children
+SEVERITY = (
+    model.Status.UNKNOWN,
+    model.Status.OK,
+    model.Status.DEGRADED,
+    model.Status.DOWN,
+)
+_RANK = {status: rank for rank, status in enumerate(SEVERITY)}
+
+
+def classify_result(
+    res: model.Result,
+    expected_ms: typing.Optional[int],
+) -> model.Status:
+    if res.timeout:
+        return model.Status.DOWN
+    if expected_ms is not None and res.responseTime > expected_ms:
+        return model.Status.DEGRADED
+    return model.Status.OK
+
+
+class _Node:
+    __slots__ = ('parent', 'status', 'counts')
+
+    def __init__(
+        self,
+        parent: typing.Optional[str],
+        children: int,
+    ):
+        self.parent = parent
+        # children per severity rank, keeps the worst status an O(1) lookup
+        self.counts = [children, 0, 0, 0]
+        self.status = model.Status.UNKNOWN
+
+    def move(
+        self,
+        old: model.Status,
+        new: model.Status,
+    ) -> bool:
+        self.counts[_RANK[old]] -= 1
+        self.counts[_RANK[new]] += 1
+        worst = next(s for s in reversed(SEVERITY) if self.counts[_RANK[s]])
+        if worst == self.status:
+            return False
+        self.status = worst
+        return True
+
+
+class HealthTree:
+    def __init__(
+        self,
+        systems: typing.List[model.System],
+        components: typing.List[model.Component],
+        classify: typing.Callable[[model.Result, typing.Optional[int]], model.Status] = classify_result,
+        on_change: typing.Optional[typing.Callable[[str, str, model.Status], None]] = None,
+        results: typing.Iterable[model.Result] = (),
+    ):
+        self.classify = classify
+        self.on_change = None
+        self._lock = threading.Lock()
+        # newest result timestamp per metric, older ones (replays, late batches) are ignored
+        self._latest: typing.Dict[MetricKey, datetime.datetime] = {}
+        self._build(systems=systems, components=components)
+        # seeding from stored results doesn't notify
+        for res in results:
+            self.update(res=res)
+        self.on_change = on_change
+        return
+
+    def _build(
+        self,
+        systems: typing.List[model.System],
+        components: typing.List[model.Component],
+    ):
+        by_system: typing.Dict[str, int] = {s.id: 0 for s in systems}
+        for c in components:
+            by_system[c.systemId] = by_system.get(c.systemId, 0) + 1
+        self._systems = {system_id: _Node(parent=None, children=n) for system_id, n in by_system.items()}
+
+        self._components: typing.Dict[str, _Node] = {}
+        self._metrics: typing.Dict[MetricKey, model.Status] = {}
+        self._expected: typing.Dict[MetricKey, int] = {}
+        for c in components:
+            metrics = c.metrics or ()
+            self._components[c.id] = _Node(parent=c.systemId, children=len(metrics))
+            for m in metrics:
+                self._metrics[(c.id, m.id)] = model.Status.UNKNOWN
+                self._expected[(c.id, m.id)] = m.expectedTime.as_ms()
+
+    @classmethod
+    def load(
+        cls,
+        operator: operations.DatabaseOperator,
+        **kwargs,
+    ) -> 'HealthTree':
+        # the latest stored result per metric, so a restart doesn't show everything as unknown
+        return cls(
+            systems=operator.select_all_systems() or [],
+            components=operator.select_all_components() or [],
+            results=operator.select_latest_results() or (),
+            **kwargs,
+        )
+
+    def update_config(
+        self,
+        systems: typing.List[model.System],
+        components: typing.List[model.Component],
+    ):
+        with self._lock:
+            metrics = self._metrics
+            previous = {('component', i): n.status for i, n in self._components.items()}
+            previous.update({('system', i): n.status for i, n in self._systems.items()})
+
+            # metrics kept across the change keep their status, new ones start unknown
+            self._build(systems=systems, components=components)
+            for key, status in metrics.items():
+                if key in self._metrics and status != model.Status.UNKNOWN:
+                    self._set(key=key, new=status, notify=False)
+
+            for kind, nodes in (('component', self._components), ('system', self._systems)):
+                for node_id, node in nodes.items():
+                    if previous.get((kind, node_id), model.Status.UNKNOWN) != node.status:
+                        self._changed(kind, node_id, node.status)
+
+    def _changed(
+        self,
+        kind: str,
+        id: str,
+        status: model.Status,
+    ):
+        logger.debug(f'{kind} {id} is {status.value}')
+        if self.on_change:
+            self.on_change(kind, id, status)
+
+    def _set(
+        self,
+        key: MetricKey,
+        new: model.Status,
+        notify: bool = True,
+    ):
+        old = self._metrics[key]
+        if new == old:
+            return
+        self._metrics[key] = new
+
+        component_id = key[0]
+        component = self._components[component_id]
+        component_old = component.status
+        if not component.move(old=old, new=new):
+            return
+        if notify:
+            self._changed('component', component_id, component.status)
+
+        if not (system := self._systems.get(component.parent)):
+            return
+        if system.move(old=component_old, new=component.status) and notify:
+            self._changed('system', component.parent, system.status)
+
+    def update(
+        self,
+        res: model.Result,
+    ):
+        key = (res.componentId, res.metricId)
+        timestamp = util.parse_timestamp(res.timestamp)
+        with self._lock:
+            if key not in self._metrics:
+                return
+            if (latest := self._latest.get(key)) and timestamp <= latest:
+                return
+            self._latest[key] = timestamp
+            self._set(key=key, new=self.classify(res, self._expected.get(key)))
+
+    def __call__(
+        self,
+        res: model.Result,
+    ):
+        self.update(res=res)
+
+    def systems(self) -> typing.Dict[str, model.Status]:
+        return {system_id: node.status for system_id, node in self._systems.items()}
+
+    def components(self) -> typing.Dict[str, model.Status]:
+        return {component_id: node.status for component_id, node in self._components.items()}
+
+    def metric(
+        self,
+        component_id: str,
+        metric_id: str,
+    ) -> typing.Optional[model.Status]:
+        return self._metrics.get((component_id, metric_id))
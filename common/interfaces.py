@@ -1,20 +1,28 @@
-
 import typing
-import requests
+
+from . import util
+
+requests = util.lazy_import('requests')
 
 
 class Callable:
     def __init__(
         self,
-        callback: str
+        callback: str,
+        timeout: float = 10.0,
     ):
         self.callback = callback
+        # seconds, a hung endpoint must not block the caller forever
+        self.timeout = timeout
 
     def call_by_get(self):
-        return requests.get(self.callback)
+        return requests.get(self.callback, timeout=self.timeout)
 
-    def call_by_post(self):
-        return requests.post(self.callback)
+    def call_by_post(
+        self,
+        json: typing.Optional[dict] = None,
+    ):
+        return requests.post(self.callback, json=json, timeout=self.timeout)
 
     def call_by_callable(
         self,
@@ -0,0 +1,105 @@
+import logging
+import math
+import os
+import socket
+import threading
+import typing
+import uuid
+
+import common.model as model
+import common.database.operations as operations
+
+
+logger = logging.getLogger(__name__)
+
+Lease = typing.Tuple[str, str]
+
+
+def default_owner() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+
+class LeaseManager:
+    def __init__(
+        self,
+        operator: operations.DatabaseOperator,
+        owner: typing.Optional[str] = None,
+        ttl: model.TimeDetail = model.TimeDetail(value=30, unit=model.TimeUnit.SECOND),
+        on_change: typing.Optional[typing.Callable[[typing.Set[Lease]], None]] = None,
+    ):
+        self.operator = operator
+        self.owner = owner or default_owner()
+        self.ttl = ttl
+        self.on_change = on_change
+        self.leases: typing.Set[Lease] = set()
+        self._stop = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+        return
+
+    def _fair_share(self) -> int:
+        total, owners = self.operator.select_lease_stats()
+        return math.ceil(total / max(owners, 1))
+
+    def acquire_leases(self) -> typing.Set[Lease]:
+        # registered before counting, so a node holding no leases yet still lowers everyone's share
+        self.operator.register_lease_owner(owner=self.owner, ttl=self.ttl)
+        share = self._fair_share()
+        if len(self.leases) < share:
+            acquired = self.operator.acquire_leases(
+                owner=self.owner,
+                ttl=self.ttl,
+                limit=share - len(self.leases),
+            )
+            self.leases.update(acquired)
+            logger.debug(f'{self.owner=} acquired {len(acquired)} leases')
+        elif len(self.leases) > share:
+            # hand surplus back so newly joined nodes can pick it up
+            surplus = sorted(self.leases)[share:]
+            self.operator.release_leases(owner=self.owner, leases=surplus)
+            self.leases.difference_update(surplus)
+            logger.debug(f'{self.owner=} released {len(surplus)} surplus leases')
+        return self.leases
+
+    def renew(self) -> typing.Set[Lease]:
+        # leases taken over after expiry are no longer returned and are dropped
+        self.leases = set(self.operator.renew_leases(owner=self.owner, ttl=self.ttl))
+        return self.leases
+
+    def release(self):
+        self.operator.release_leases(owner=self.owner)
+        self.operator.deregister_lease_owner(owner=self.owner)
+        self.leases = set()
+
+    def heartbeat(self):
+        before = set(self.leases)
+        self.renew()
+        self.acquire_leases()
+        if self.on_change and self.leases != before:
+            self.on_change(set(self.leases))
+
+    def _run(self):
+        interval = self.ttl.as_ms() / 1000 / 3
+        while not self._stop.is_set():
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f'lease heartbeat failed: {e}')
+            self._stop.wait(interval)
+
+    def start(self):
+        # metrics stored before the lease table existed have no lease rows yet
+        self.operator.sync_leases()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f'lease-{self.owner}',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.release()
@@ -0,0 +1,398 @@
+import argparse
+import collections
+import contextlib
+from dataclasses import dataclass, field
+import datetime
+import itertools
+import json
+import logging
+import os
+import random
+import resource
+import threading
+import time
+import typing
+
+from . import model
+from . import util
+import common.database.operations as operations
+
+
+logger = logging.getLogger(__name__)
+
+
+def synthesize_config(
+    systems: int,
+    components: int,
+    metrics: int,
+) -> model.Config:
+    # components and metrics are per system and per component respectively
+    frequency = model.TimeDetail(value=30, unit=model.TimeUnit.SECOND)
+    expected = model.TimeDetail(value=200, unit=model.TimeUnit.MILLISECOND)
+    timeout = model.TimeDetail(value=5, unit=model.TimeUnit.SECOND)
+    delete_after = model.TimeDetail(value=7, unit=model.TimeUnit.DAY)
+
+    return model.Config(
+        systems=[model.System(id=f'loadgen-system-{s}', name=f'system {s}', ref='') for s in range(systems)],
+        components=[model.Component(
+            id=f'loadgen-component-{s}-{c}',
+            name=f'component {s}-{c}',
+            systemId=f'loadgen-system-{s}',
+            baseUrl=f'http://loadgen-{s}-{c}.local',
+            ref='',
+            authToken='',
+            metrics=[model.Metric(
+                id=f'metric-{m}',
+                endpoint=f'/metric/{m}',
+                frequency=frequency,
+                expectedTime=expected,
+                timeout=timeout,
+                deleteAfter=delete_after,
+                authToken='',
+                baseUrl=f'http://loadgen-{s}-{c}.local',
+            ) for m in range(metrics)],
+        ) for s in range(systems) for c in range(components)],
+        version=model.Version.V1,
+        cacheCallback='',
+    )
+
+
+class InMemoryConnection:
+    # stands in for DatabaseConnection on the paths exercised by the harness
+    def __init__(self):
+        self.systems: typing.Dict[str, model.System] = {}
+        self.components: typing.Dict[str, model.Component] = {}
+        self.metrics: typing.Dict[str, typing.Dict[str, model.Metric]] = collections.defaultdict(dict)
+        self.results: typing.Dict[tuple, model.Result] = {}
+        self.comments: typing.Dict[tuple, model.Comment] = {}
+        self._lock = threading.Lock()
+        return
+
+    @contextlib.contextmanager
+    def budget(self, timeouts):
+        yield self
+
+    def kill(self):
+        pass
+
+    def insert_system(self, system: model.System):
+        self.systems[system.id] = system
+
+    def insert_component(self, component: model.Component):
+        self.components[component.id] = component
+
+    def insert_metric(self, metric: model.Metric, component_id: str):
+        self.metrics[component_id][metric.id] = metric
+
+    def select_system(self, system_id: str):
+        return self.systems.get(system_id)
+
+    def select_component(self, component_id: str):
+        return self.components.get(component_id)
+
+    def sync_leases(self):
+        pass
+
+    def select_component_from_system_id(self, system_id: str):
+        return [c for c in self.components.values() if c.systemId == system_id] or None
+
+    def delete_system(self, system_id: str):
+        self.systems.pop(system_id, None)
+
+    def delete_component(self, component_id: str):
+        self.components.pop(component_id, None)
+
+    def delete_metric_by_component_id(self, component_id: str):
+        self.metrics.pop(component_id, None)
+
+    def delete_result_from_component_id(self, component_id: str):
+        with self._lock:
+            self.results = {k: r for k, r in self.results.items() if r.componentId != component_id}
+
+    def delete_comment_from_component_id(self, component_id: str):
+        with self._lock:
+            self.comments = {k: c for k, c in self.comments.items() if c.componentId != component_id}
+
+    def insert_result(self, res: model.Result, idempotent: bool = False) -> bool:
+        return bool(self.insert_results(results=[res], idempotent=idempotent))
+
+    def insert_results(self, results: typing.List[model.Result], idempotent: bool = False):
+        inserted = []
+        with self._lock:
+            for r in results:
+                key = (r.componentId, r.metricId, r.timestamp)
+                if not idempotent:
+                    # without the unique key duplicates are kept, like the plain table
+                    key += (len(self.results),)
+                elif key in self.results:
+                    continue
+                self.results[key] = r
+                inserted.append(r)
+        return inserted
+
+    def insert_comment(self, comment: model.Comment):
+        self.insert_comments(comments=[comment])
+
+    def insert_comments(self, comments: typing.List[model.Comment]):
+        with self._lock:
+            for c in comments:
+                self.comments[(c.metricId, c.componentId, c.timestamp)] = c
+
+    def select_all_systems(self):
+        return list(self.systems.values()) or None
+
+    def select_all_components(self):
+        return [
+            model.Component(
+                id=c.id,
+                name=c.name,
+                systemId=c.systemId,
+                baseUrl=c.baseUrl,
+                ref=c.ref,
+                authToken=c.authToken,
+                metrics=list(self.metrics.get(c.id, {}).values()) or None,
+            ) for c in self.components.values()
+        ] or None
+
+    def select_all_results(self):
+        with self._lock:
+            return list(self.results.values()) or None
+
+    def select_all_comments(self):
+        with self._lock:
+            return list(self.comments.values()) or None
+
+
+def percentile(
+    values: typing.Sequence[float],
+    q: float,
+) -> typing.Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # peak instead of current, ru_maxrss is in kilobytes on linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class OperationStats:
+    count: int = 0
+    rows: int = 0
+    latencies: typing.List[float] = field(default_factory=list)
+
+    def as_dict(
+        self,
+        elapsed: float,
+    ) -> dict:
+        return {
+            'count': self.count,
+            'rowsPerSecond': self.rows / elapsed if elapsed else 0.0,
+            'p50Ms': (percentile(self.latencies, 0.5) or 0.0) * 1000,
+            'p99Ms': (percentile(self.latencies, 0.99) or 0.0) * 1000,
+        }
+
+
+@dataclass
+class LoadReport:
+    elapsed: float
+    operations: typing.Dict[str, OperationStats]
+    # (seconds since start, rss bytes)
+    memory: typing.List[typing.Tuple[float, int]]
+
+    def summary(self) -> dict:
+        return {
+            'elapsed': self.elapsed,
+            'operations': {name: s.as_dict(elapsed=self.elapsed) for name, s in self.operations.items()},
+            'peakRssBytes': max((m for _, m in self.memory), default=0),
+            'rssBytes': [[round(t, 1), m] for t, m in self.memory],
+        }
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        write_operator: operations.DatabaseOperator,
+        read_operator: typing.Optional[operations.DatabaseOperator] = None,
+        write_rate: float = 1000.0,
+        read_rate: float = 1.0,
+        comment_ratio: float = 0.001,
+        batch_size: int = 100,
+        sample_interval: float = 1.0,
+    ):
+        self.write_operator = write_operator
+        self.read_operator = read_operator or write_operator
+        self.write_rate = write_rate
+        self.read_rate = read_rate
+        self.comment_ratio = comment_ratio
+        self.batch_size = batch_size
+        self.sample_interval = sample_interval
+        self.stats: typing.Dict[str, OperationStats] = collections.defaultdict(OperationStats)
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        return
+
+    def _timed(
+        self,
+        name: str,
+        rows: int,
+        func: typing.Callable,
+        *args,
+        **kwargs,
+    ):
+        start = time.perf_counter()
+        res = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            stat = self.stats[name]
+            stat.count += 1
+            stat.rows += rows
+            stat.latencies.append(elapsed)
+        return res
+
+    def _paced(
+        self,
+        rate: float,
+    ) -> typing.Iterator[None]:
+        # fixed schedule, a slow call is caught up on instead of lowering the rate
+        interval = 1 / rate
+        next_run = time.monotonic()
+        while not self._stop.is_set():
+            if (delay := next_run - time.monotonic()) > 0 and self._stop.wait(delay):
+                return
+            yield
+            next_run += interval
+
+    def _write_loop(
+        self,
+        keys: typing.List[typing.Tuple[str, str]],
+    ):
+        rng = random.Random(0)
+        key_cycle = itertools.cycle(keys)
+        for _ in self._paced(rate=self.write_rate / self.batch_size):
+            now = datetime.datetime.now(datetime.timezone.utc)
+            batch = []
+            for i in range(self.batch_size):
+                component_id, metric_id = next(key_cycle)
+                batch.append(model.Result(
+                    metricId=metric_id,
+                    componentId=component_id,
+                    value=None if rng.random() < 0.01 else '200',
+                    timeout=rng.random() < 0.01,
+                    timestamp=str(now + datetime.timedelta(microseconds=i)),
+                    responseTime=int(rng.expovariate(1 / 120)),
+                ))
+            if len(batch) == 1:
+                self._timed('insert_result', 1, self.write_operator.insert_result, res=batch[0])
+            else:
+                self._timed('insert_results', len(batch), self.write_operator.insert_results, results=batch)
+
+            if rng.random() < self.comment_ratio * self.batch_size:
+                component_id, metric_id = next(key_cycle)
+                self._timed('insert_comment', 1, self.write_operator.insert_comment, comment=model.Comment(
+                    metricId=metric_id,
+                    componentId=component_id,
+                    comment='loadgen',
+                    timestamp=str(now),
+                    startTimestamp=str(now),
+                    endTimestamp=None,
+                ))
+
+    def _read_loop(self):
+        reads = itertools.cycle((
+            self.read_operator.select_all_components,
+            self.read_operator.select_all_results,
+            self.read_operator.select_all_comments,
+        ))
+        for _ in self._paced(rate=self.read_rate):
+            read = next(reads)
+            res = self._timed(read.__name__, 0, read)
+            with self._stats_lock:
+                self.stats[read.__name__].rows += len(res or ())
+
+    def run(
+        self,
+        cfg: model.Config,
+        duration: float,
+    ) -> LoadReport:
+        self._timed('insert_config', sum(len(c.metrics or ()) for c in cfg.components),
+                    self.write_operator.insert_config, cfg=cfg)
+        keys = [(c.id, m.id) for c in cfg.components for m in c.metrics or ()]
+
+        self._stop.clear()
+        threads = [threading.Thread(target=self._write_loop, args=(keys,), name='loadgen-write', daemon=True)]
+        if self.read_rate > 0:
+            threads.append(threading.Thread(target=self._read_loop, name='loadgen-read', daemon=True))
+
+        memory: typing.List[typing.Tuple[float, int]] = []
+        start = time.monotonic()
+        for t in threads:
+            t.start()
+        while (elapsed := time.monotonic() - start) < duration:
+            memory.append((elapsed, rss_bytes()))
+            logger.info(f'{elapsed=:.0f}s rss={memory[-1][1] / 2**20:.1f}MiB '
+                        f'writes={sum(s.rows for n, s in self.stats.items() if n.startswith("insert_result"))}')
+            time.sleep(min(self.sample_interval, max(duration - elapsed, 0)))
+        self._stop.set()
+        for t in threads:
+            t.join()
+        memory.append((time.monotonic() - start, rss_bytes()))
+
+        return LoadReport(
+            elapsed=time.monotonic() - start,
+            operations=dict(self.stats),
+            memory=memory,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='synthetic load against the openmonitor ingest path')
+    parser.add_argument('--systems', type=int, default=10)
+    parser.add_argument('--components', type=int, default=10, help='per system')
+    parser.add_argument('--metrics', type=int, default=10, help='per component')
+    parser.add_argument('--write-rate', type=float, default=1000.0, help='results per second')
+    parser.add_argument('--read-rate', type=float, default=1.0, help='dashboard reads per second')
+    parser.add_argument('--comment-ratio', type=float, default=0.001, help='comments per result')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds')
+    parser.add_argument('--backend', choices=('memory', 'postgres'), default='memory')
+    parser.add_argument('--idempotent', action='store_true')
+    args = parser.parse_args()
+
+    util.configure_default_logging()
+
+    if args.backend == 'postgres':
+        import common.database.factory as factory
+        fac = factory.DatabaseConnectionFactory()
+        write_conn, read_conn = fac.make_connection(), fac.make_read_connection()
+    else:
+        write_conn = read_conn = InMemoryConnection()
+
+    generator = LoadGenerator(
+        write_operator=operations.DatabaseOperator(connection=write_conn, idempotent=args.idempotent),
+        read_operator=operations.DatabaseOperator(connection=read_conn),
+        write_rate=args.write_rate,
+        read_rate=args.read_rate,
+        comment_ratio=args.comment_ratio,
+        batch_size=args.batch_size,
+    )
+    report = generator.run(
+        cfg=synthesize_config(systems=args.systems, components=args.components, metrics=args.metrics),
+        duration=args.duration,
+    )
+    write_conn.kill()
+    if read_conn is not write_conn:
+        read_conn.kill()
+
+    print(json.dumps(report.summary(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,12 @@ class Version(Enum):
     V1 = 'v1'
     V2 = 'v2'
 
+class Status(Enum):
+    UNKNOWN = 'unknown'
+    OK = 'ok'
+    DEGRADED = 'degraded'
+    DOWN = 'down'
+
 class TimeUnit(Enum):
     MILLISECOND = 'ms'
     SECOND = 's'
@@ -16,10 +22,10 @@ class TimeUnit(Enum):
 
 class TimeUnitMilliseconds(Enum):
     MILLISECOND = 1
-    SECOND = 60
-    MINUTE = 3600
-    HOUR = 216000
-    DAY = 5184000
+    SECOND = 1000
+    MINUTE = 60000
+    HOUR = 3600000
+    DAY = 86400000
 
 class TimeUnitPhoenic(Enum):
     MILLISECOND = 'milliseconds'
@@ -5,6 +5,13 @@ class Observer(interfaces.Callable):
         self,
         name: str,
         callback: str,
+        timeout: float = 10.0,
     ):
         self.name = name
-        super(Observer, self).__init__(callback=callback)
+        super(Observer, self).__init__(callback=callback, timeout=timeout)
+
+    def notify(
+        self,
+        payload: dict,
+    ):
+        return self.call_by_post(json=payload)
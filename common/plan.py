@@ -0,0 +1,83 @@
+import typing
+
+from . import model
+from . import util
+
+
+MetricKey = typing.Tuple[str, str]
+
+
+class ProbeTarget(typing.NamedTuple):
+    componentId: str
+    metricId: str
+    url: str
+    headers: typing.Dict[str, str]
+    timeoutMs: int
+    expectedMs: int
+    frequencyMs: int
+
+
+class ProbePlan:
+    def __init__(
+        self,
+        components: typing.Iterable[model.Component] = (),
+    ):
+        self.targets: typing.Dict[MetricKey, ProbeTarget] = {}
+        # inputs a target was built from, unchanged inputs keep their target
+        self._sources: typing.Dict[MetricKey, tuple] = {}
+        # one shared headers dict per token instead of one per target
+        self._headers: typing.Dict[typing.Optional[str], typing.Dict[str, str]] = {None: {}}
+        self.update(components=components)
+        return
+
+    def _prepared_headers(
+        self,
+        token: typing.Optional[str],
+    ) -> typing.Dict[str, str]:
+        if (headers := self._headers.get(token)) is None:
+            headers = self._headers[token] = {'Authorization': f'Bearer {token}'}
+        return headers
+
+    def _build(
+        self,
+        component: model.Component,
+        metric: model.Metric,
+    ) -> ProbeTarget:
+        return ProbeTarget(
+            componentId=component.id,
+            metricId=metric.id,
+            url=util.urljoin(metric.baseUrl or component.baseUrl, metric.endpoint),
+            headers=self._prepared_headers(token=metric.authToken or component.authToken or None),
+            timeoutMs=metric.timeout.as_ms(),
+            expectedMs=metric.expectedTime.as_ms(),
+            frequencyMs=metric.frequency.as_ms(),
+        )
+
+    def update(
+        self,
+        components: typing.Iterable[model.Component],
+    ) -> typing.Set[MetricKey]:
+        targets: typing.Dict[MetricKey, ProbeTarget] = {}
+        sources: typing.Dict[MetricKey, tuple] = {}
+        changed: typing.Set[MetricKey] = set()
+        for c in components:
+            for m in c.metrics or ():
+                key = (c.id, m.id)
+                source = (c.baseUrl, c.authToken, m)
+                if self._sources.get(key) == source:
+                    targets[key] = self.targets[key]
+                else:
+                    targets[key] = self._build(component=c, metric=m)
+                    changed.add(key)
+                sources[key] = source
+
+        changed.update(self.targets.keys() - targets.keys())
+        self.targets = targets
+        self._sources = sources
+        return changed
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __iter__(self) -> typing.Iterator[ProbeTarget]:
+        return iter(self.targets.values())
@@ -0,0 +1,239 @@
+import collections
+import cProfile
+import functools
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import typing
+
+import common.database.operations as operations
+
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+def _write_collapsed(
+    path: str,
+    counts: typing.Dict[str, int],
+):
+    # flamegraph.pl / speedscope 'collapsed' format: frames joined by ';' and a count
+    with open(path, 'w') as f:
+        for stack, count in sorted(counts.items()):
+            f.write(f'{stack} {count}\n')
+
+
+class StackSampler:
+    def __init__(
+        self,
+        interval: float = 0.01,
+    ):
+        self.interval = interval
+        self.counts: typing.Counter[str] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+        return
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame=frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.counts[';'.join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._stop.clear()
+        self.counts.clear()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def dump(
+        self,
+        path: str,
+    ):
+        _write_collapsed(path=path, counts=self.counts)
+
+
+class MethodTimer:
+    def __init__(
+        self,
+        operator: operations.DatabaseOperator,
+    ):
+        self.operator = operator
+        # method name -> [calls, total seconds, max seconds]
+        self.stats: typing.Dict[str, typing.List[float]] = {}
+        self._instrumented: typing.List[str] = []
+        self._lock = threading.Lock()
+        return
+
+    def _wrap(
+        self,
+        name: str,
+        method: typing.Callable,
+    ) -> typing.Callable:
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    stat = self.stats.setdefault(name, [0, 0.0, 0.0])
+                    stat[0] += 1
+                    stat[1] += elapsed
+                    stat[2] = max(stat[2], elapsed)
+        return timed
+
+    def instrument(self):
+        self.stats = {}
+        for name in dir(type(self.operator)):
+            if name.startswith('_') or not callable(getattr(type(self.operator), name)):
+                continue
+            # instance attributes shadow the class methods until uninstrument
+            setattr(self.operator, name, self._wrap(name=name, method=getattr(self.operator, name)))
+            self._instrumented.append(name)
+
+    def uninstrument(self):
+        for name in self._instrumented:
+            delattr(self.operator, name)
+        self._instrumented = []
+
+    def dump(
+        self,
+        path: str,
+    ):
+        # total microseconds per method, flamegraph tools render it like a sampled profile
+        _write_collapsed(path=path, counts={
+            f'{type(self.operator).__name__};{name}': int(total * 1_000_000)
+            for name, (_, total, _) in self.stats.items()
+        })
+
+    def dump_stats(
+        self,
+        path: str,
+    ):
+        # one line per method, most time spent first
+        with open(path, 'w') as f:
+            f.write('method\tcalls\ttotal_ms\tmean_ms\tmax_ms\n')
+            for name, (calls, total, longest) in sorted(self.stats.items(), key=lambda s: -s[1][1]):
+                f.write(f'{name}\t{calls}\t{total * 1000:.3f}\t{total * 1000 / calls:.3f}\t{longest * 1000:.3f}\n')
+
+
+class Profiler:
+    def __init__(
+        self,
+        directory: str,
+        operators: typing.Iterable[operations.DatabaseOperator] = (),
+        sample_interval: float = 0.01,
+        cprofile: bool = True,
+    ):
+        self.directory = directory
+        self.sampler = StackSampler(interval=sample_interval)
+        self.timers = [MethodTimer(operator=o) for o in operators]
+        # cProfile only sees the thread that enabled it, the sampler covers the rest
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.running = False
+        # toggle may run from a signal handler interrupting start/stop on the same thread,
+        # it doesn't wait for the lock then, it ignores the signal
+        self._lock = threading.Lock()
+        return
+
+    def _start(self):
+        if self.running:
+            return
+        logger.info('profiling started')
+        self.sampler.start()
+        for timer in self.timers:
+            timer.instrument()
+        if self.cprofile:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self.running = True
+
+    def _stop(self) -> typing.List[str]:
+        if not self.running:
+            return []
+        self.running = False
+        if self.cprofile:
+            self.cprofile.disable()
+        self.sampler.stop()
+        for timer in self.timers:
+            timer.uninstrument()
+        return self.dump()
+
+    def start(self):
+        with self._lock:
+            self._start()
+
+    def stop(self) -> typing.List[str]:
+        with self._lock:
+            return self._stop()
+
+    def toggle(self, *args) -> typing.List[str]:
+        # signature fits signal handlers and observer callables alike
+        if not self._lock.acquire(blocking=False):
+            logger.warning('profiler is starting or stopping, toggle ignored')
+            return []
+        try:
+            if self.running:
+                return self._stop()
+            self._start()
+            return []
+        finally:
+            self._lock.release()
+
+    def dump(self) -> typing.List[str]:
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = os.path.join(self.directory, f'profile-{os.getpid()}-{time.strftime("%Y%m%d-%H%M%S")}')
+
+        paths = [f'{prefix}.stacks.collapsed']
+        self.sampler.dump(path=paths[0])
+        if self.cprofile:
+            paths.append(f'{prefix}.pstats')
+            self.cprofile.dump_stats(paths[-1])
+        for i, timer in enumerate(self.timers):
+            paths.append(f'{prefix}.operator-{i}.collapsed')
+            timer.dump(path=paths[-1])
+            paths.append(f'{prefix}.operator-{i}.tsv')
+            timer.dump_stats(path=paths[-1])
+
+        logger.info(f'profiles written to {", ".join(paths)}')
+        return paths
+
+    def capture(
+        self,
+        duration: float,
+    ) -> typing.List[str]:
+        self.start()
+        time.sleep(duration)
+        return self.stop()
+
+    def install_signal_handler(
+        self,
+        signum: int = signal.SIGUSR2,
+    ):
+        signal.signal(signum, self.toggle)
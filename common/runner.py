@@ -0,0 +1,305 @@
+import concurrent.futures
+import datetime
+import heapq
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import typing
+
+import common.lease as lease
+import common.model as model
+import common.plan as plan
+import common.sharding as sharding
+import common.util as commonutil
+import common.database.factory as dbfactory
+import common.database.operations as operations
+import common.database.writer as writer
+
+
+logger = logging.getLogger(__name__)
+
+requests = commonutil.lazy_import('requests')
+
+# the parent runs supervisor, lease and logging threads, a forked child could inherit
+# a lock held by one of them and deadlock, workers start from a fresh interpreter instead
+_mp = multiprocessing.get_context('spawn')
+
+
+def metric_key(
+    component_id: str,
+    metric_id: str,
+) -> str:
+    return f'{component_id}/{metric_id}'
+
+
+def probe_target(
+    target: plan.ProbeTarget,
+) -> model.Result:
+    timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    start = time.monotonic()
+    try:
+        resp = requests.get(target.url, headers=target.headers, timeout=target.timeoutMs / 1000)
+        value, timeout = str(resp.status_code), False
+    except requests.Timeout:
+        value, timeout = None, True
+    except requests.RequestException as e:
+        value, timeout = str(e), False
+
+    return model.Result(
+        metricId=target.metricId,
+        componentId=target.componentId,
+        value=value,
+        timeout=timeout,
+        timestamp=timestamp,
+        responseTime=int((time.monotonic() - start) * 1000),
+    )
+
+
+def _run_worker(
+    shard: int,
+    factory: dbfactory.DatabaseConnectionFactory,
+    assignments: multiprocessing.Queue,
+    stop: multiprocessing.Event,
+    probe: typing.Callable[[plan.ProbeTarget], model.Result],
+    batch_size: int,
+    flush_interval: float,
+    threads: int,
+):
+    conn = factory.make_connection()
+    result_writer = writer.ResultWriter(
+        operator=operations.DatabaseOperator(connection=conn, idempotent=True),
+        batch_size=batch_size,
+        flush_interval=flush_interval,
+    )
+    # probes mostly wait on the network, a slow endpoint must not stall the rest of the shard
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f'probe-{shard}')
+    done: queue.SimpleQueue = queue.SimpleQueue()
+    in_flight: typing.Set[str] = set()
+
+    def run_probe(key: str, target: plan.ProbeTarget):
+        try:
+            done.put((key, probe(target)))
+        except Exception as e:
+            logger.error(f'shard {shard}: probing {key} failed: {e}')
+            done.put((key, None))
+
+    # key -> (generation, target); heap entries carry the generation
+    # so entries of reassigned or changed metrics are dropped when popped
+    schedule: typing.Dict[str, typing.Tuple[int, plan.ProbeTarget]] = {}
+    due: typing.List[typing.Tuple[float, int, str]] = []
+    generation = 0
+
+    try:
+        while not stop.is_set():
+            wait = flush_interval
+            if due:
+                wait = min(wait, max(0.0, due[0][0] - time.monotonic()))
+            try:
+                update = assignments.get(timeout=wait)
+            except queue.Empty:
+                update = None
+
+            if update is not None:
+                new_schedule = {}
+                for target in update:
+                    key = metric_key(component_id=target.componentId, metric_id=target.metricId)
+                    if (old := schedule.get(key)) and old[1] == target:
+                        new_schedule[key] = old
+                        continue
+                    generation += 1
+                    new_schedule[key] = (generation, target)
+                    heapq.heappush(due, (time.monotonic(), generation, key))
+                logger.info(f'shard {shard}: {len(new_schedule)} metrics assigned')
+                schedule = new_schedule
+
+            now = time.monotonic()
+            while due and due[0][0] <= now:
+                _, gen, key = heapq.heappop(due)
+                if not (entry := schedule.get(key)) or entry[0] != gen:
+                    continue
+                target = entry[1]
+                # a probe still running from the last round skips this one
+                if key not in in_flight:
+                    in_flight.add(key)
+                    pool.submit(run_probe, key, target)
+                heapq.heappush(due, (now + target.frequencyMs / 1000, gen, key))
+
+            try:
+                while True:
+                    try:
+                        key, res = done.get_nowait()
+                    except queue.Empty:
+                        break
+                    in_flight.discard(key)
+                    if res is not None:
+                        result_writer.write(res=res)
+                result_writer.flush_if_due()
+            except Exception as e:
+                # unwritten results stay buffered and go out with the next flush
+                logger.error(f'shard {shard}: writing results failed: {e}')
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        try:
+            result_writer.flush()
+        except Exception as e:
+            logger.error(f'shard {shard}: final flush failed: {e}')
+        conn.kill()
+
+
+class ProbeRunner:
+    def __init__(
+        self,
+        factory: dbfactory.DatabaseConnectionFactory,
+        processes: typing.Optional[int] = None,
+        probe: typing.Callable[[plan.ProbeTarget], model.Result] = probe_target,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        replicas: int = 100,
+        leases: typing.Optional[lease.LeaseManager] = None,
+        threads: int = 8,
+        supervise_interval: float = 5.0,
+    ):
+        self.factory = factory
+        self.leases = leases
+        self.probe = probe
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # probe threads per worker process
+        self.threads = threads
+        self.supervise_interval = supervise_interval
+        self.operator = operations.DatabaseOperator(connection=factory.make_connection())
+        self.ring = sharding.HashRing(
+            nodes=range(processes or multiprocessing.cpu_count()),
+            replicas=replicas,
+        )
+        self._workers: typing.Dict[
+            int,
+            typing.Tuple[multiprocessing.Process, multiprocessing.Queue, multiprocessing.Event],
+        ] = {}
+        # last assignment per shard, handed to a worker again when it gets restarted
+        self._assigned: typing.Dict[int, typing.List[plan.ProbeTarget]] = {}
+        self.plan = plan.ProbePlan()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._supervisor: typing.Optional[threading.Thread] = None
+        if leases:
+            leases.on_change = lambda _: self.rebalance()
+        return
+
+    def assign(
+        self,
+        targets: typing.Iterable[plan.ProbeTarget],
+    ) -> typing.Dict[int, typing.List[plan.ProbeTarget]]:
+        shards: typing.Dict[int, typing.List[plan.ProbeTarget]] = {n: [] for n in self.ring.nodes}
+        owned = self.leases.leases if self.leases else None
+        for t in targets:
+            if owned is not None and (t.componentId, t.metricId) not in owned:
+                continue
+            shards[self.ring.get_node(metric_key(component_id=t.componentId, metric_id=t.metricId))].append(t)
+        return shards
+
+    def _start_worker(
+        self,
+        shard: int,
+    ):
+        assignments = _mp.Queue()
+        stop = _mp.Event()
+        process = _mp.Process(
+            target=_run_worker,
+            name=f'probe-worker-{shard}',
+            kwargs=dict(
+                shard=shard,
+                factory=self.factory,
+                assignments=assignments,
+                stop=stop,
+                probe=self.probe,
+                batch_size=self.batch_size,
+                flush_interval=self.flush_interval,
+                threads=self.threads,
+            ),
+            daemon=True,
+        )
+        process.start()
+        self._workers[shard] = (process, assignments, stop)
+
+    def check_workers(self) -> typing.List[int]:
+        restarted = []
+        with self._lock:
+            for shard, (process, _, stop) in list(self._workers.items()):
+                if process.is_alive() or stop.is_set():
+                    continue
+                logger.error(f'probe worker {shard} died (exit code {process.exitcode}), restarting')
+                self._start_worker(shard=shard)
+                self._workers[shard][1].put(self._assigned.get(shard, []))
+                restarted.append(shard)
+        return restarted
+
+    def _supervise(self):
+        while not self._stopping.wait(self.supervise_interval):
+            try:
+                self.check_workers()
+            except Exception as e:
+                logger.error(f'checking probe workers failed: {e}')
+
+    def start(self):
+        logger.info(f'starting {len(self.ring.nodes)} probe workers')
+        self._stopping.clear()
+        for shard in self.ring.nodes:
+            self._start_worker(shard=shard)
+        if self.leases:
+            self.leases.start()
+        self.rebalance()
+        self._supervisor = threading.Thread(target=self._supervise, name='probe-supervisor', daemon=True)
+        self._supervisor.start()
+
+    def rebalance(self):
+        with self._lock:
+            # only targets of changed metrics are rebuilt, the rest is reused as is
+            self.plan.update(components=self.operator.select_all_components() or [])
+            self._assigned = self.assign(targets=self.plan)
+            for shard, assigned in self._assigned.items():
+                self._workers[shard][1].put(assigned)
+
+    def apply_config(
+        self,
+        cfg: model.Config,
+    ):
+        with self._lock:
+            self.operator.insert_config(cfg=cfg)
+        self.rebalance()
+
+    def scale(
+        self,
+        processes: int,
+    ):
+        with self._lock:
+            current = self.ring.nodes
+            for shard in set(range(processes)) - current:
+                self.ring.add_node(node=shard)
+                self._start_worker(shard=shard)
+            for shard in current - set(range(processes)):
+                self.ring.remove_node(node=shard)
+                process, _, stop = self._workers.pop(shard)
+                stop.set()
+                process.join()
+        self.rebalance()
+
+    def stop(
+        self,
+        timeout: float = 10.0,
+    ):
+        logger.info('stopping probe workers')
+        self._stopping.set()
+        if self._supervisor:
+            self._supervisor.join()
+            self._supervisor = None
+        if self.leases:
+            self.leases.stop()
+        for _, _, stop in self._workers.values():
+            stop.set()
+        for process, _, _ in self._workers.values():
+            process.join(timeout=timeout)
+        self._workers = {}
+        self.operator.connection.kill()
@@ -0,0 +1,57 @@
+import bisect
+import hashlib
+import typing
+
+
+class HashRing:
+    def __init__(
+        self,
+        nodes: typing.Iterable[typing.Hashable] = (),
+        replicas: int = 100,
+    ):
+        self.replicas = replicas
+        self._hashes: typing.List[int] = []
+        self._nodes: typing.Dict[int, typing.Hashable] = {}
+        for node in nodes:
+            self.add_node(node=node)
+        return
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # python's hash() is salted per process, workers need a stable hash
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    @property
+    def nodes(self) -> typing.Set[typing.Hashable]:
+        return set(self._nodes.values())
+
+    def add_node(
+        self,
+        node: typing.Hashable,
+    ):
+        for i in range(self.replicas):
+            h = self._hash(f'{node}#{i}')
+            if h in self._nodes:
+                continue
+            bisect.insort(self._hashes, h)
+            self._nodes[h] = node
+
+    def remove_node(
+        self,
+        node: typing.Hashable,
+    ):
+        for i in range(self.replicas):
+            h = self._hash(f'{node}#{i}')
+            if self._nodes.get(h) != node:
+                continue
+            del self._nodes[h]
+            self._hashes.pop(bisect.bisect_left(self._hashes, h))
+
+    def get_node(
+        self,
+        key: str,
+    ) -> typing.Hashable:
+        if not self._hashes:
+            return None
+        idx = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._nodes[self._hashes[idx]]
@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+import datetime
+import typing
+
+import common.exceptions as exceptions
+import common.model as model
+import common.database.operations as operations
+
+
+@dataclass(frozen=True)
+class SlaReport:
+    total: int = 0
+    timeouts: int = 0
+    withinSlo: int = 0
+    responseTimeSum: int = 0
+
+    def __add__(self, other: 'SlaReport') -> 'SlaReport':
+        return SlaReport(
+            total=self.total + other.total,
+            timeouts=self.timeouts + other.timeouts,
+            withinSlo=self.withinSlo + other.withinSlo,
+            responseTimeSum=self.responseTimeSum + other.responseTimeSum,
+        )
+
+    @property
+    def availability(self) -> typing.Optional[float]:
+        if not self.total:
+            return None
+        return (self.total - self.timeouts) / self.total
+
+    @property
+    def sloCompliance(self) -> typing.Optional[float]:
+        if not self.total:
+            return None
+        return self.withinSlo / self.total
+
+    @property
+    def meanResponseTime(self) -> typing.Optional[float]:
+        if not (answered := self.total - self.timeouts):
+            return None
+        return self.responseTimeSum / answered
+
+
+@dataclass(frozen=True)
+class SlaReports:
+    metrics: typing.Dict[typing.Tuple[str, str], SlaReport]
+    components: typing.Dict[str, SlaReport]
+    systems: typing.Dict[str, SlaReport]
+
+
+_HOUR = datetime.timedelta(hours=1)
+
+
+def _utc(
+    ts: datetime.datetime,
+    name: str,
+) -> datetime.datetime:
+    # checkpoint buckets are timestamptz truncated to hours in UTC
+    if ts.tzinfo is None or ts.utcoffset() is None:
+        raise exceptions.OpenmonitorError(f'{name} must be timezone aware: {ts}')
+    return ts.astimezone(datetime.timezone.utc)
+
+
+def _floor_hour(ts: datetime.datetime) -> datetime.datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(ts: datetime.datetime) -> datetime.datetime:
+    floored = _floor_hour(ts)
+    return floored if floored == ts else floored + _HOUR
+
+
+class SlaEngine:
+    def __init__(
+        self,
+        operator: operations.DatabaseOperator,
+        grace: model.TimeDetail = model.TimeDetail(value=5, unit=model.TimeUnit.MINUTE),
+    ):
+        self.operator = operator
+        # how long after its end an hour gets checkpointed, leaves room for late flushes
+        self.grace = grace
+        return
+
+    def refresh(
+        self,
+        since: typing.Optional[datetime.datetime] = None,
+    ):
+        # continues after the last checkpoint, pass since to recompute older hours
+        # (e.g. after a comment window changed)
+        if since is not None:
+            since = _floor_hour(_utc(since, 'since'))
+        self.operator.refresh_sla_checkpoints(since=since, grace=self.grace)
+
+    def report(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+    ) -> SlaReports:
+        start = _utc(start, 'start')
+        end = _utc(end, 'end')
+        checkpoint_start = _ceil_hour(start)
+        checkpoint_end = _floor_hour(end)
+        if frontier := self.operator.select_sla_frontier():
+            checkpoint_end = min(checkpoint_end, frontier)
+        if not frontier or checkpoint_end <= checkpoint_start:
+            checkpoint_start = checkpoint_end = end
+
+        metrics: typing.Dict[typing.Tuple[str, str], SlaReport] = {}
+        components: typing.Dict[str, SlaReport] = {}
+        systems: typing.Dict[str, SlaReport] = {}
+        for component_id, metric_id, system_id, *counts in self.operator.select_sla_aggregates(
+            start=start,
+            end=end,
+            checkpoint_start=checkpoint_start,
+            checkpoint_end=checkpoint_end,
+        ):
+            report = SlaReport(*(int(c) for c in counts))
+            metrics[(component_id, metric_id)] = report
+            components[component_id] = components.get(component_id, SlaReport()) + report
+            systems[system_id] = systems.get(system_id, SlaReport()) + report
+
+        return SlaReports(
+            metrics=metrics,
+            components=components,
+            systems=systems,
+        )
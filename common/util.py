@@ -1,13 +1,44 @@
-from copy import copy
+import atexit
+import datetime
+import functools
+import importlib
+import json
 import logging
-import logging.config
+import logging.handlers
 import re
 import sys
+import time
+import types
+import typing
 
 from . import exceptions
 from . import model
 
 
+class LazyModule(types.ModuleType):
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        try:
+            value = getattr(module, attr)
+        except AttributeError:
+            # submodules (e.g. psycopg2.extras) are not attributes until imported
+            value = importlib.import_module(f'{self.__name__}.{attr}')
+        setattr(self, attr, value)
+        return value
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def parse_timestamp(timestamp) -> datetime.datetime:
+    # naive timestamps are taken as UTC, so they compare with aware ones
+    ts = timestamp if isinstance(timestamp, datetime.datetime) else datetime.datetime.fromisoformat(str(timestamp))
+    return ts if ts.tzinfo else ts.replace(tzinfo=datetime.timezone.utc)
+
+
 def urljoin(*parts):
     if len(parts) == 1:
         return parts[0]
@@ -41,16 +72,52 @@ class LogFormatter(logging.Formatter):
         func = self.level_colors.get(level_number, default)
         return func(level_name)
 
+    def __init__(
+        self,
+        *args,
+        use_colors: typing.Optional[bool] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        if use_colors is None:
+            use_colors = sys.stdout.isatty()
+        self.use_colors = use_colors
+
     def formatMessage(self, record):
-        record_copy = copy(record)
-        levelname = record_copy.levelname
-        if sys.stdout.isatty():
-            levelname = self.color_level_name(levelname, record_copy.levelno)
-            if "color_message" in record_copy.__dict__:
-                record_copy.msg = record_copy.__dict__["color_message"]
-                record_copy.__dict__["message"] = record_copy.getMessage()
-        record_copy.__dict__["levelprefix"] = levelname
-        return super().formatMessage(record_copy)
+        levelname = record.levelname
+        if self.use_colors:
+            levelname = self.color_level_name(levelname, record.levelno)
+            if "color_message" in record.__dict__:
+                # rare path, leave the record itself untouched for other handlers
+                values = dict(record.__dict__, levelprefix=levelname)
+                values["message"] = record.color_message % record.args if record.args else record.color_message
+                return self._style.format(types.SimpleNamespace(**values))
+        record.levelprefix = levelname
+        return super().formatMessage(record)
+
+
+class JsonLogFormatter(logging.Formatter):
+    def __init__(
+        self,
+        print_thread_id: bool = False,
+    ):
+        super().__init__()
+        self.print_thread_id = print_thread_id
+
+    def format(self, record):
+        entry = {
+            'timestamp': f'{time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))}.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if self.print_thread_id:
+            entry['thread'] = record.thread
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
 
 
 class Bcolors:
@@ -62,11 +129,39 @@ class Bcolors:
     BLUE = '\033[34m'
 
 
+_exception_formatter = logging.Formatter()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # render on the calling thread, args may change and tracebacks would keep frames
+        # alive while queued, the listener's formatter only sees strings
+        if 'color_message' in record.__dict__ and record.args:
+            record.color_message = record.color_message % record.args
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+_queue_listener = None
+
+
+def _stop_queue_listener():
+    global _queue_listener
+    if _queue_listener:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
 def configure_default_logging(
     stdout_level=None,
     force=True,
     print_thread_id=False,
+    structured=False,
+    use_queue=False,
 ):
+    global _queue_listener
     if not stdout_level:
         stdout_level = logging.INFO
 
@@ -75,11 +170,29 @@ def configure_default_logging(
         for h in logging.root.handlers:
             logging.root.removeHandler(h)
             h.close()
+        _stop_queue_listener()
 
     sh = logging.StreamHandler(stream=sys.stdout)
     sh.setLevel(stdout_level)
-    sh.setFormatter(LogFormatter(fmt=default_fmt_string(print_thread_id=print_thread_id)))
-    logging.root.addHandler(hdlr=sh)
+    if structured:
+        sh.setFormatter(JsonLogFormatter(print_thread_id=print_thread_id))
+    else:
+        sh.setFormatter(LogFormatter(fmt=default_fmt_string(print_thread_id=print_thread_id)))
+
+    if use_queue:
+        # records are handed off to a background thread, callers never block on stdout
+        import queue
+
+        _stop_queue_listener()
+        q = queue.SimpleQueue()
+        _queue_listener = logging.handlers.QueueListener(q, sh, respect_handler_level=True)
+        _queue_listener.start()
+        atexit.register(_stop_queue_listener)
+        handler = _QueueHandler(q)
+    else:
+        handler = sh
+
+    logging.root.addHandler(hdlr=handler)
     logging.root.setLevel(level=stdout_level)
 
 
@@ -109,11 +222,15 @@ def strip_time_str_to_int(
     return int(timeout_str)
 
 
+_time_str_regex = re.compile('([0-9]+)(ms|s|m|h|d)')
+
+
+# configs repeat a handful of distinct time strings across all metrics
+@functools.lru_cache(maxsize=1024)
 def parse_time_str_to_timedetail(
     time_str :str,
 ) -> model.TimeDetail:
-    regex = re.compile('([0-9]+)(ms|s|m|h|d)')
-    res = regex.match(time_str)
+    res = _time_str_regex.match(time_str)
     if not res:
         raise exceptions.OpenmonitorConfigError('Unable to parse config', time_str=time_str)
     return model.TimeDetail(
@@ -0,0 +1,52 @@
+import datetime
+import itertools
+
+import pytest
+
+import common.model as model
+
+
+START = datetime.datetime(2021, 5, 1, 10, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def make_metric():
+    def factory(
+        metric_id='metric',
+        endpoint='/',
+        base_url='',
+    ):
+        return model.Metric(
+            id=metric_id,
+            endpoint=endpoint,
+            frequency=model.TimeDetail(value=30, unit=model.TimeUnit.SECOND),
+            expectedTime=model.TimeDetail(value=200, unit=model.TimeUnit.MILLISECOND),
+            timeout=model.TimeDetail(value=5, unit=model.TimeUnit.SECOND),
+            deleteAfter=model.TimeDetail(value=7, unit=model.TimeUnit.DAY),
+            authToken='',
+            baseUrl=base_url,
+        )
+    return factory
+
+
+@pytest.fixture
+def make_result():
+    # each result is a second after the previous one unless a timestamp is given
+    seconds = itertools.count()
+
+    def factory(
+        component_id='component',
+        metric_id='metric',
+        timeout=False,
+        response_time=100,
+        timestamp=None,
+    ):
+        return model.Result(
+            metricId=metric_id,
+            componentId=component_id,
+            value=None if timeout else '200',
+            timeout=timeout,
+            timestamp=timestamp or str(START + datetime.timedelta(seconds=next(seconds))),
+            responseTime=response_time,
+        )
+    return factory
@@ -0,0 +1,95 @@
+import common.alerting as alerting
+import common.database.operations as ops
+import common.loadgen as loadgen
+import common.model as model
+
+
+class RecordingObserver:
+    name = 'recording'
+
+    def __init__(self):
+        self.payloads = []
+
+    def notify(self, payload):
+        self.payloads.append(payload)
+
+
+def _evaluator(make_metric, **kwargs):
+    o = RecordingObserver()
+    evaluator = alerting.AlertEvaluator(observers=[o], asynchronous=False, **kwargs)
+    evaluator.update_metrics(components=[model.Component(
+        id='component', name='', systemId='', baseUrl='', ref='', authToken='', metrics=[make_metric('metric')],
+    )])
+    return evaluator, o
+
+
+def test_consecutive_timeouts_fire_once(make_metric, make_result):
+    evaluator, o = _evaluator(make_metric, min_interval=0)
+
+    for _ in range(10):
+        evaluator.process(res=make_result(timeout=True))
+
+    assert [p['status'] for p in o.payloads] == ['down']
+
+    evaluator.process(res=make_result())
+
+    assert [p['status'] for p in o.payloads] == ['down', 'ok']
+
+
+def test_slow_responses_degrade(make_metric, make_result):
+    evaluator, o = _evaluator(make_metric, min_interval=0)
+
+    for _ in range(20):
+        evaluator.process(res=make_result(response_time=1000))
+
+    assert [p['status'] for p in o.payloads] == ['degraded']
+    assert o.payloads[0]['ewmaResponseTime'] > 200
+
+
+def test_transitions_rate_limited(make_metric, make_result):
+    evaluator, o = _evaluator(make_metric, min_interval=3600)
+
+    for timeout in (True, True, True, False, True, True, True):
+        evaluator.process(res=make_result(timeout=timeout))
+
+    assert [p['status'] for p in o.payloads] == ['down']
+    assert evaluator.states[('component', 'metric')].status == model.Status.DOWN
+
+
+def test_asynchronous_dispatch(make_result):
+    o = RecordingObserver()
+    evaluator = alerting.AlertEvaluator(observers=[o], down_after=1)
+
+    evaluator.process(res=make_result(timeout=True))
+    evaluator.close()
+
+    assert [p['status'] for p in o.payloads] == ['down']
+
+
+def test_older_results_ignored(make_metric, make_result):
+    evaluator, o = _evaluator(make_metric, min_interval=0, down_after=1)
+    old = make_result(timeout=True)
+
+    evaluator.process(res=make_result())
+    assert evaluator.process(res=old) is None
+
+    assert o.payloads == []
+    assert evaluator.states[('component', 'metric')].consecutive_timeouts == 0
+
+
+def test_replayed_results_not_notified(make_metric, make_result):
+    evaluator, o = _evaluator(make_metric, min_interval=0, down_after=2)
+    processed = []
+    operator = ops.DatabaseOperator(
+        connection=loadgen.InMemoryConnection(),
+        result_listeners=[evaluator, processed.append],
+        idempotent=True,
+    )
+    batch = [make_result(timeout=True), make_result()]
+
+    operator.insert_results(results=batch)
+    operator.insert_results(results=batch + [make_result(timeout=True)])
+    operator.insert_result(res=batch[0])
+
+    assert processed == batch + [processed[-1]]
+    assert o.payloads == []
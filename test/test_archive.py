@@ -0,0 +1,70 @@
+import datetime
+import os
+
+import pytest
+
+import common.archive as archive
+import common.exceptions as exceptions
+import common.model as model
+
+
+START = datetime.datetime(2021, 5, 1, 10, tzinfo=datetime.timezone.utc)
+
+
+def _results(count: int = 100):
+    return [model.Result(
+        metricId='metric',
+        componentId='component/1',
+        value=None if i % 10 == 0 else str(200 + i % 3),
+        timeout=i % 7 == 0,
+        timestamp=str(START + datetime.timedelta(seconds=i, microseconds=i * 7)),
+        responseTime=None if i % 13 == 0 else i * 3,
+    ) for i in range(count)]
+
+
+def test_segment_roundtrip(tmp_path):
+    results = _results()
+
+    path = archive.write_segment(directory=str(tmp_path), results=results)
+
+    with archive.SegmentReader(path=path) as reader:
+        assert len(reader) == len(results)
+        assert list(reader) == results
+        arrays = reader.arrays()
+    assert list(arrays['responseTime']) == [r.responseTime or 0 for r in results]
+    assert list(arrays['responseTimeNull']) == [int(r.responseTime is None) for r in results]
+    assert list(arrays['timeout']) == [int(r.timeout) for r in results]
+    assert arrays['value'] == [r.value for r in results]
+    assert os.path.getsize(path) < len(results) * 8
+
+
+def test_segment_normalises_offsets_to_utc(tmp_path):
+    local = datetime.timezone(datetime.timedelta(hours=2))
+    results = [model.Result('metric', 'component', '200', False, '2021-05-01 12:00:00+02:00', 10)]
+
+    path = archive.write_segment(directory=str(tmp_path), results=results)
+
+    with archive.SegmentReader(path=path) as reader:
+        restored = next(iter(reader)).timestamp
+    assert restored == '2021-05-01 10:00:00+00:00'
+    assert datetime.datetime.fromisoformat(restored) == datetime.datetime(2021, 5, 1, 12, tzinfo=local)
+
+
+def test_iter_archived_results(tmp_path):
+    results = _results(count=120)
+    archive.write_segment(directory=str(tmp_path), results=results[60:])
+    archive.write_segment(directory=str(tmp_path), results=results[:60])
+
+    assert list(archive.iter_archived_results(
+        directory=str(tmp_path),
+        component_id='component/1',
+        metric_id='metric',
+    )) == results
+
+
+def test_segment_rejects_mixed_metrics():
+    results = _results(count=2)
+    results.append(model.Result('other', 'component/1', None, False, results[0].timestamp, 0))
+
+    with pytest.raises(exceptions.OpenmonitorError):
+        archive.encode_segment(results=results)
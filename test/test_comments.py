@@ -0,0 +1,96 @@
+import common.database.connection as connection
+import common.database.factory as factory
+import common.database.operations as ops
+import common.loadgen as loadgen
+import common.model as model
+
+
+def _comment(metric_id='metric-0', timestamp='2021-05-01 10:00:00+00:00', text='maintenance', end=None):
+    return model.Comment(
+        metricId=metric_id,
+        componentId='loadgen-component-0-0',
+        comment=text,
+        timestamp=timestamp,
+        startTimestamp=timestamp,
+        endTimestamp=end,
+    )
+
+
+def test_insert_comments_deduplicates_batch():
+    conn = connection.DatabaseConnection(connection=None)
+    conn._comment_key = True
+    batches = []
+    conn._execute_values = lambda statement, values: batches.append(values)
+
+    conn.insert_comments(comments=[
+        _comment(text='first'),
+        _comment(timestamp='2021-05-01T10:00:00Z', text='second'),
+        _comment(metric_id='metric-1'),
+    ])
+
+    assert [(v[0], v[2]) for v in batches[0]] == [('metric-0', 'second'), ('metric-1', 'maintenance')]
+
+
+def _setup():
+    operator = ops.DatabaseOperator(connection=factory.DatabaseConnectionFactory().make_connection())
+    operator.create_schema()
+    operator.insert_config(cfg=loadgen.synthesize_config(systems=1, components=1, metrics=2))
+    operator.connection._execute("DELETE FROM comment", ())
+    return operator
+
+
+def _stored(operator):
+    return sorted((c.metricId, c.comment, c.endTimestamp) for c in operator.select_all_comments() or ())
+
+
+def test_insert_comments_upserts():
+    operator = _setup()
+
+    operator.insert_comments(comments=[_comment(text='first'), _comment(text='second')])
+    operator.insert_comments(comments=[_comment(text='third'), _comment(metric_id='metric-1')])
+
+    assert _stored(operator) == [('metric-0', 'third', 'None'), ('metric-1', 'maintenance', 'None')]
+
+
+def test_close_comments():
+    operator = _setup()
+    operator.insert_comments(comments=[
+        _comment(),
+        _comment(metric_id='metric-1'),
+        _comment(timestamp='2021-05-01 08:00:00+00:00', end='2021-05-01 09:00:00+00:00'),
+    ])
+
+    assert operator.close_comments(end_timestamp='2021-05-01 12:00:00+00:00', metric_ids=['metric-0']) == 1
+    assert operator.close_comments(end_timestamp='2021-05-01 12:00:00+00:00') == 1
+    assert not [c for c in operator.select_all_comments() if c.endTimestamp == 'None']
+
+
+def test_update_comment_moves_key():
+    operator = _setup()
+    old = _comment()
+    operator.insert_comments(comments=[old, _comment(timestamp='2021-05-01 11:00:00+00:00', text='taken')])
+
+    operator.update_comment(old=old, new=_comment(timestamp='2021-05-01 11:00:00+00:00', text='moved'))
+
+    assert _stored(operator) == [('metric-0', 'moved', 'None')]
+
+
+def test_comments_without_key_index():
+    operator = _setup()
+    operator.connection._execute("DROP INDEX comment_key", ())
+    operator.connection._comment_key = None
+    old = _comment()
+    operator.insert_comment(comment=old)
+    operator.insert_comment(comment=old)
+
+    operator.update_comment(old=old, new=_comment(text='edited'))
+    assert _stored(operator) == [('metric-0', 'edited', 'None')]
+
+    operator.insert_comments(comments=[_comment(text='again'), _comment(metric_id='metric-1')])
+    assert _stored(operator) == [('metric-0', 'again', 'None'), ('metric-1', 'maintenance', 'None')]
+
+    # create_schema drops the duplicates before restoring the key
+    operator.insert_comment(comment=_comment(metric_id='metric-1'))
+    operator.create_schema()
+    assert operator.connection._has_comment_key()
+    assert _stored(operator) == [('metric-0', 'again', 'None'), ('metric-1', 'maintenance', 'None')]
@@ -0,0 +1,107 @@
+import json
+import time
+
+import pytest
+
+import common.config as config
+import common.exceptions as exceptions
+import common.model as model
+
+
+def _doc(metrics: int = 2):
+    return {
+        'version': 'v1',
+        'cacheCallback': 'http://localhost/cache',
+        'systems': [{'id': 'sys', 'name': 'System', 'ref': ''}],
+        'components': [{
+            'id': 'comp',
+            'name': 'Component',
+            'systemId': 'sys',
+            'baseUrl': 'http://localhost',
+            'ref': '',
+            'authToken': 'token',
+            'metrics': [{
+                'id': f'metric-{i}',
+                'endpoint': '/health',
+                'frequency': '30s',
+                'expectedTime': '200ms',
+                'timeout': '5s',
+                'deleteAfter': '7d',
+            } for i in range(metrics)],
+        }],
+    }
+
+
+def test_load_yaml_config(tmp_path):
+    config._cache.clear()
+    path = tmp_path / 'config.yaml'
+    path.write_text('''
+version: v1
+systems:
+  - id: sys
+    name: System
+components:
+  - id: comp
+    name: Component
+    systemId: sys
+    baseUrl: http://localhost
+    metrics:
+      - id: m
+        endpoint: /health
+        frequency: 30s
+        expectedTime: 200ms
+        timeout: 5s
+        deleteAfter: 7d
+''')
+    cfg = config.load_config(path=str(path))
+
+    assert cfg.version == model.Version.V1
+    assert cfg.systems[0].id == 'sys'
+    metric = cfg.components[0].metrics[0]
+    assert metric.frequency == model.TimeDetail(value=30, unit=model.TimeUnit.SECOND)
+    assert metric.baseUrl == 'http://localhost'
+
+
+def test_load_json_config_cached(tmp_path):
+    config._cache.clear()
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps(_doc()))
+
+    cfg = config.load_config(path=str(path))
+    cfg.components[0].metrics.clear()
+
+    cached = config.load_config(path=str(path))
+    assert len(cached.components[0].metrics) == 2
+    assert cached.components[0].metrics[1].authToken == 'token'
+
+    path.write_text(json.dumps(_doc(metrics=3)))
+    assert len(config.load_config(path=str(path)).components[0].metrics) == 3
+    assert len(config._cache) == 1
+
+
+def test_load_large_json_config(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps(_doc(metrics=50_000)))
+    config._cache.clear()
+
+    start = time.perf_counter()
+    cfg = config.load_config(path=str(path))
+    assert time.perf_counter() - start < 1.0
+    assert len(cfg.components[0].metrics) == 50_000
+
+
+@pytest.mark.parametrize('mutate', [
+    lambda d: d['components'][0].update(systemId='unknown'),
+    lambda d: d['systems'].append(dict(d['systems'][0])),
+    lambda d: d['components'].append(dict(d['components'][0])),
+    lambda d: d['components'][0]['metrics'].append(dict(d['components'][0]['metrics'][0])),
+    lambda d: d['components'][0]['metrics'][0].update(frequency='often'),
+    lambda d: d['components'][0]['metrics'][0].pop('endpoint'),
+    lambda d: d['components'][0].pop('baseUrl'),
+])
+def test_invalid_config(mutate):
+    doc = _doc()
+    mutate(doc)
+
+    with pytest.raises(exceptions.OpenmonitorConfigError):
+        config.parse_config(doc=doc)
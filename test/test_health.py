@@ -0,0 +1,117 @@
+import common.database.operations as ops
+import common.health as health
+import common.loadgen as loadgen
+import common.model as model
+
+
+SYSTEMS = [model.System(id='sys', name='', ref='')]
+
+
+def _components(make_metric, *extra):
+    return [
+        model.Component('a', '', 'sys', '', '', '', [make_metric('m0'), make_metric('m1'), *extra]),
+        model.Component('b', '', 'sys', '', '', '', [make_metric('m0')]),
+    ]
+
+
+def _tree(make_metric, **kwargs):
+    return health.HealthTree(systems=SYSTEMS, components=_components(make_metric), **kwargs)
+
+
+class FakeOperator:
+    def __init__(self, components, results):
+        self.components = components
+        self.results = results
+
+    def select_all_systems(self):
+        return SYSTEMS
+
+    def select_all_components(self):
+        return self.components
+
+    def select_latest_results(self):
+        return self.results
+
+
+def test_status_propagates_to_system(make_metric, make_result):
+    changes = []
+    tree = _tree(make_metric, on_change=lambda kind, id, status: changes.append((kind, id, status)))
+    assert tree.systems() == {'sys': model.Status.UNKNOWN}
+
+    for c, m in (('a', 'm0'), ('a', 'm1'), ('b', 'm0')):
+        tree.update(res=make_result(c, m))
+    assert tree.systems() == {'sys': model.Status.OK}
+
+    tree.update(res=make_result('a', 'm1', response_time=500))
+    assert tree.components() == {'a': model.Status.DEGRADED, 'b': model.Status.OK}
+
+    tree.update(res=make_result('b', 'm0', timeout=True))
+    assert tree.systems() == {'sys': model.Status.DOWN}
+
+    tree.update(res=make_result('b', 'm0'))
+    assert tree.systems() == {'sys': model.Status.DEGRADED}
+    assert changes[-1] == ('system', 'sys', model.Status.DEGRADED)
+
+
+def test_unchanged_status_does_not_notify(make_metric, make_result):
+    changes = []
+    tree = _tree(make_metric, on_change=lambda *args: changes.append(args))
+
+    tree.update(res=make_result('a', 'm0'))
+    count = len(changes)
+    tree.update(res=make_result('a', 'm0'))
+    tree.update(res=make_result('unknown', 'm0'))
+
+    assert len(changes) == count
+
+
+def test_update_config_keeps_known_statuses(make_metric, make_result):
+    changes = []
+    tree = _tree(make_metric, on_change=lambda *args: changes.append(args))
+    for c, m in (('a', 'm0'), ('a', 'm1'), ('b', 'm0')):
+        tree.update(res=make_result(c, m))
+    changes.clear()
+
+    tree.update_config(systems=SYSTEMS, components=_components(make_metric, make_metric('m2')))
+    assert tree.metric('a', 'm0') == model.Status.OK
+    assert tree.components()['a'] == model.Status.OK
+    assert changes == []
+
+    tree.update(res=make_result('a', 'm2', timeout=True))
+    assert tree.components()['a'] == model.Status.DOWN
+    assert changes[0] == ('component', 'a', model.Status.DOWN)
+
+
+def test_load_seeds_latest_results(make_metric, make_result):
+    changes = []
+    operator = FakeOperator(
+        components=_components(make_metric),
+        results=[make_result('a', 'm0'), make_result('a', 'm1', timeout=True), make_result('b', 'm0')],
+    )
+
+    tree = health.HealthTree.load(operator=operator, on_change=lambda *args: changes.append(args))
+
+    assert tree.components() == {'a': model.Status.DOWN, 'b': model.Status.OK}
+    assert tree.systems() == {'sys': model.Status.DOWN}
+    assert changes == []
+
+
+def test_insert_config_updates_tree():
+    operator = ops.DatabaseOperator(connection=loadgen.InMemoryConnection())
+    tree = health.HealthTree(systems=[], components=[])
+    operator.add_config_listener(tree.update_config)
+
+    operator.insert_config(cfg=loadgen.synthesize_config(systems=1, components=2, metrics=3))
+
+    assert tree.systems() == {'loadgen-system-0': model.Status.UNKNOWN}
+    assert tree.metric('loadgen-component-0-1', 'metric-2') == model.Status.UNKNOWN
+
+
+def test_older_results_ignored(make_metric, make_result):
+    tree = _tree(make_metric)
+    old = make_result('b', 'm0', timeout=True)
+
+    tree.update(res=make_result('b', 'm0'))
+    tree.update(res=old)
+
+    assert tree.metric('b', 'm0') == model.Status.OK
@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+import pytest
+
+
+# cumulative import budget per module, in microseconds
+IMPORT_BUDGET_US = 250_000
+
+HEAVY_MODULES = {'psycopg2', 'requests', 'yaml'}
+
+
+def _import_times(module: str):
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize('module', [
+    'common.model',
+    'common.util',
+    'common.config',
+    'common.interfaces',
+    'common.observer',
+    'common.database.connection',
+    'common.database.factory',
+    'common.database.operations',
+])
+def test_import_is_lightweight(module):
+    times = _import_times(module=module)
+
+    assert not HEAVY_MODULES & {name.split('.')[0] for name in times}
+    assert times[module] < IMPORT_BUDGET_US
@@ -0,0 +1,130 @@
+import multiprocessing
+import time
+
+import common.database.factory as factory
+import common.database.operations as ops
+import common.lease as lease
+import common.model as model
+
+
+TTL = model.TimeDetail(value=2, unit=model.TimeUnit.SECOND)
+
+
+def _make_operator():
+    return ops.DatabaseOperator(connection=factory.DatabaseConnectionFactory().make_connection())
+
+
+def _make_config(metrics: int):
+    interval = model.TimeDetail(value=1, unit=model.TimeUnit.MINUTE)
+    return model.Config(
+        systems=[model.System(id='lease-test', name='lease-test', ref='')],
+        components=[model.Component(
+            id='lease-test-component',
+            name='lease-test-component',
+            systemId='lease-test',
+            baseUrl='http://localhost',
+            ref='',
+            authToken='',
+            metrics=[model.Metric(
+                id=f'metric-{i}',
+                endpoint='/',
+                frequency=interval,
+                expectedTime=interval,
+                timeout=interval,
+                deleteAfter=interval,
+                authToken='',
+                baseUrl='http://localhost',
+            ) for i in range(metrics)],
+        )],
+        version=model.Version.V1,
+        cacheCallback='',
+    )
+
+
+def _acquire(owner, barrier, results):
+    manager = lease.LeaseManager(operator=_make_operator(), owner=owner, ttl=TTL)
+    barrier.wait()
+    for _ in range(5):
+        manager.heartbeat()
+        barrier.wait()
+    results[owner] = sorted(manager.leases)
+    barrier.wait()
+    manager.release()
+
+
+def _setup(metrics: int):
+    operator = _make_operator()
+    operator.create_schema()
+    operator.insert_config(cfg=_make_config(metrics=metrics))
+    operator.connection._execute("UPDATE lease SET owner = NULL, expires = '-infinity'", ())
+    operator.connection._execute("DELETE FROM lease_owner", ())
+    return operator
+
+
+def test_leases_split_across_processes():
+    _setup(metrics=30)
+
+    nodes = 3
+    barrier = multiprocessing.Barrier(nodes)
+    with multiprocessing.Manager() as manager:
+        results = manager.dict()
+        procs = [
+            multiprocessing.Process(target=_acquire, args=(f'node-{i}', barrier, results))
+            for i in range(nodes)
+        ]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        results = dict(results)
+
+    owned = [set(v) for v in results.values()]
+    assert sum(len(o) for o in owned) == 30
+    assert set().union(*owned) == {('lease-test-component', f'metric-{i}') for i in range(30)}
+    assert all(len(o) == 10 for o in owned)
+
+
+def test_late_joiner_gets_share():
+    operator = _setup(metrics=30)
+
+    early = lease.LeaseManager(operator=operator, owner='early', ttl=TTL)
+    early.heartbeat()
+    assert len(early.leases) == 30
+
+    late = lease.LeaseManager(operator=_make_operator(), owner='late', ttl=TTL)
+    late.heartbeat()
+    assert not late.leases
+
+    # the early node sheds its surplus on its next heartbeat, the late one picks it up on its own
+    for _ in range(2):
+        early.heartbeat()
+        late.heartbeat()
+    assert len(early.leases) == len(late.leases) == 15
+    assert not early.leases & late.leases
+    early.release()
+    late.release()
+
+
+def test_leases_taken_over_after_ttl():
+    operator = _setup(metrics=4)
+
+    dead = lease.LeaseManager(operator=operator, owner='dead-node', ttl=TTL)
+    assert len(dead.acquire_leases()) == 4
+
+    survivor = lease.LeaseManager(operator=_make_operator(), owner='survivor', ttl=TTL)
+    assert not survivor.acquire_leases()
+
+    time.sleep(TTL.as_ms() / 1000 + 0.5)
+    assert len(survivor.acquire_leases()) == 4
+    assert not dead.renew()
+    survivor.release()
+
+
+def test_insert_config_syncs_leases():
+    operator = _setup(metrics=4)
+
+    operator.insert_config(cfg=_make_config(metrics=2))
+
+    manager = lease.LeaseManager(operator=operator, owner='node', ttl=TTL)
+    assert manager.acquire_leases() == {('lease-test-component', f'metric-{i}') for i in range(2)}
+    manager.release()
@@ -0,0 +1,30 @@
+import common.database.operations as ops
+import common.loadgen as loadgen
+
+
+def test_synthesize_config():
+    cfg = loadgen.synthesize_config(systems=2, components=3, metrics=4)
+
+    assert len(cfg.systems) == 2
+    assert len(cfg.components) == 6
+    assert sum(len(c.metrics) for c in cfg.components) == 24
+
+
+def test_load_against_memory_backend():
+    conn = loadgen.InMemoryConnection()
+    generator = loadgen.LoadGenerator(
+        write_operator=ops.DatabaseOperator(connection=conn, idempotent=True),
+        write_rate=2000,
+        read_rate=10,
+        batch_size=50,
+        sample_interval=0.1,
+    )
+
+    report = generator.run(cfg=loadgen.synthesize_config(systems=1, components=2, metrics=5), duration=0.5)
+    summary = report.summary()
+
+    assert len(conn.components) == 2
+    assert summary['operations']['insert_results']['count'] > 0
+    assert summary['operations']['insert_results']['p99Ms'] >= summary['operations']['insert_results']['p50Ms']
+    assert len(conn.results) == generator.stats['insert_results'].rows
+    assert report.memory and summary['peakRssBytes'] > 0
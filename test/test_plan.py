@@ -0,0 +1,33 @@
+import dataclasses
+
+import common.model as model
+import common.plan as plan
+
+
+def _component(metrics, token='secret'):
+    return model.Component('comp', '', 'sys', 'http://localhost/', '', token, metrics)
+
+
+def test_plan_precomputes_targets(make_metric):
+    p = plan.ProbePlan(components=[_component([make_metric('a', endpoint='/health'), make_metric('b')])])
+
+    target = p.targets[('comp', 'a')]
+    assert target.url == 'http://localhost/health'
+    assert target.headers == {'Authorization': 'Bearer secret'}
+    assert (target.timeoutMs, target.expectedMs, target.frequencyMs) == (5000, 200, 30000)
+    assert target.headers is p.targets[('comp', 'b')].headers
+
+
+def test_plan_update_is_incremental(make_metric):
+    a, b = make_metric('a'), make_metric('b')
+    p = plan.ProbePlan(components=[_component([a, b])])
+    before = p.targets[('comp', 'a')]
+
+    changed = p.update(components=[_component([a, dataclasses.replace(b, endpoint='/other'), make_metric('c')])])
+
+    assert changed == {('comp', 'b'), ('comp', 'c')}
+    assert p.targets[('comp', 'a')] is before
+    assert p.targets[('comp', 'b')].url == 'http://localhost/other'
+
+    assert p.update(components=[_component([a])]) == {('comp', 'b'), ('comp', 'c')}
+    assert len(p) == 1
@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+
+import common.profiling as profiling
+
+
+class Operator:
+    def select_all_results(self):
+        time.sleep(0.01)
+        return []
+
+
+def _busy(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_dumps_profiles(tmp_path):
+    operator = Operator()
+    profiler = profiling.Profiler(directory=str(tmp_path), operators=[operator], sample_interval=0.001)
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy, args=(stop,), name='busy-worker')
+    worker.start()
+
+    profiler.toggle()
+    operator.select_all_results()
+    time.sleep(0.05)
+    paths = profiler.toggle()
+    stop.set()
+    worker.join()
+
+    assert len(paths) == 4 and all(os.path.exists(p) for p in paths)
+    with open(paths[0]) as f:
+        stacks = f.read()
+    assert 'busy-worker;' in stacks and 'test_profiling.py:_busy' in stacks
+    with open(paths[2]) as f:
+        assert f.read().startswith('Operator;select_all_results ')
+    with open(paths[3]) as f:
+        header, row = f.read().splitlines()
+    name, calls, total, mean, longest = row.split('\t')
+    assert header.split('\t') == ['method', 'calls', 'total_ms', 'mean_ms', 'max_ms']
+    assert (name, calls) == ('select_all_results', '1')
+    assert float(longest) >= 10
+    assert 'select_all_results' not in vars(operator)
+
+
+def test_toggle_ignored_during_start(tmp_path):
+    operator = Operator()
+    profiler = profiling.Profiler(directory=str(tmp_path), operators=[operator], cprofile=False)
+    # a signal arriving in the middle of start() finds the lock taken
+    toggled = []
+    instrument = profiler.timers[0].instrument
+
+    def interrupted():
+        toggled.append(profiler.toggle())
+        instrument()
+
+    profiler.timers[0].instrument = interrupted
+
+    profiler.start()
+    assert toggled == [[]] and profiler.running
+    assert len(profiler.stop()) == 3
+    assert 'select_all_results' not in vars(operator)
@@ -0,0 +1,155 @@
+import os
+import threading
+
+import pytest
+
+import common.database.factory as factory
+import common.database.operations as ops
+import common.database.routing as routing
+
+
+class FakeConnection:
+    def __init__(self, name, lag=0.0):
+        self.name = name
+        self.lag = lag
+        self.calls = []
+        self.broken = False
+        self.error = None
+
+    def select_all_results(self):
+        self.calls.append('select_all_results')
+        if self.error:
+            raise self.error
+        return self.name
+
+    def kill(self):
+        self.broken = True
+
+    def insert_result(self, res, idempotent=False):
+        self.calls.append('insert_result')
+
+    def select_replication_lag(self):
+        return self.lag
+
+
+def test_reads_round_robin_writes_primary():
+    primary = FakeConnection('primary')
+    replicas = [FakeConnection('r0'), FakeConnection('r1')]
+    operator = ops.DatabaseOperator(
+        connection=primary,
+        read_connection=routing.ReplicaRouter(primary=primary, replicas=replicas),
+    )
+
+    assert [operator.select_all_results() for _ in range(4)] == ['r0', 'r1', 'r0', 'r1']
+
+    operator.insert_result(res=None)
+    assert primary.calls == ['insert_result']
+
+
+def test_lagging_replicas_skipped():
+    primary = FakeConnection('primary')
+    replicas = [FakeConnection('r0', lag=30.0), FakeConnection('r1', lag=0.5)]
+    router = routing.ReplicaRouter(primary=primary, replicas=replicas, max_lag=1.0)
+
+    assert {router.select_all_results() for _ in range(4)} == {'r1'}
+
+    replicas[1].lag = 30.0
+    router._lag_checked = float('-inf')
+    assert router.select_all_results() == 'primary'
+
+
+def test_writes_never_routed_to_replicas():
+    primary = FakeConnection('primary')
+    replicas = [FakeConnection('r0')]
+    router = routing.ReplicaRouter(primary=primary, replicas=replicas)
+
+    router.insert_result(res=None)
+
+    assert primary.calls == ['insert_result']
+    assert not replicas[0].calls
+
+
+def test_broken_replica_falls_back_to_primary():
+    primary = FakeConnection('primary')
+    replicas = [FakeConnection('r0')]
+    replacement = FakeConnection('r0-reconnected')
+    router = routing.ReplicaRouter(
+        primary=primary,
+        replicas=replicas,
+        reconnect=lambda i: replacement,
+        retry_interval=3600,
+    )
+    replicas[0].error = ConnectionError('server closed the connection unexpectedly')
+    replicas[0].broken = True
+
+    assert router.select_all_results() == 'primary'
+    assert router.select_all_results() == 'primary'
+    assert replicas[0].calls == ['select_all_results']
+
+    router.retry_interval = 0
+    # the reconnect runs in the background, this read still goes to the primary
+    assert router.select_all_results() == 'primary'
+    for thread in list(router._reconnecting.values()):
+        thread.join()
+    assert router.select_all_results() == 'r0-reconnected'
+    assert router.replicas == [replacement]
+
+
+def test_reconnect_does_not_block_reads():
+    primary = FakeConnection('primary')
+    replicas = [FakeConnection('r0')]
+    connecting = threading.Event()
+    unreachable = threading.Event()
+
+    def reconnect(i):
+        connecting.set()
+        unreachable.wait()
+        raise ConnectionError('timeout expired')
+
+    router = routing.ReplicaRouter(primary=primary, replicas=replicas, reconnect=reconnect, retry_interval=0)
+    replicas[0].broken = True
+    router._fail(idx=0, error=ConnectionError('server closed the connection unexpectedly'))
+
+    assert router.select_all_results() == 'primary'
+    assert connecting.wait(timeout=1)
+    assert router.select_all_results() == 'primary'
+
+    thread = router._reconnecting[0]
+    unreachable.set()
+    thread.join()
+    assert router._failed[0] is not None
+
+
+def test_replica_errors_on_healthy_connection_propagate():
+    primary = FakeConnection('primary')
+    replicas = [FakeConnection('r0')]
+    router = routing.ReplicaRouter(primary=primary, replicas=replicas)
+    replicas[0].error = ValueError('bad query')
+
+    with pytest.raises(ValueError):
+        router.select_all_results()
+    assert not primary.calls
+
+
+def test_least_latency_prefers_fastest():
+    primary = FakeConnection('primary')
+    replicas = [FakeConnection('r0'), FakeConnection('r1')]
+    router = routing.ReplicaRouter(primary=primary, replicas=replicas, strategy=routing.LEAST_LATENCY)
+    router.latencies = [0.5, 0.01]
+
+    assert router.select_all_results() == 'r1'
+
+
+@pytest.mark.skipif(not os.getenv('DBREPLICAS'), reason='needs a second local postgres in DBREPLICAS')
+def test_replica_routing_against_postgres():
+    fac = factory.DatabaseConnectionFactory()
+    primary = fac.make_connection()
+    operator = ops.DatabaseOperator(
+        connection=primary,
+        read_connection=fac.make_read_connection(primary=primary),
+    )
+
+    assert isinstance(operator.read_connection, routing.ReplicaRouter)
+    assert operator.read_connection.replicas
+    operator.select_all_systems()
+    operator.read_connection.kill()
@@ -0,0 +1,23 @@
+import common.database.factory as factory
+import common.database.operations as ops
+import common.loadgen as loadgen
+import common.model as model
+
+
+def test_idempotent_insert_notifies_stored_naive_timestamps():
+    notified = []
+    operator = ops.DatabaseOperator(
+        connection=factory.DatabaseConnectionFactory().make_connection(),
+        result_listeners=[notified.append],
+        idempotent=True,
+    )
+    operator.create_schema()
+    operator.insert_config(cfg=loadgen.synthesize_config(systems=1, components=1, metrics=2))
+    results = [
+        model.Result(f'metric-{i}', 'loadgen-component-0-0', '200', False, '2021-05-01 10:00:00', 10)
+        for i in range(2)
+    ]
+
+    assert len(operator.insert_results(results=results)) == 2
+    assert operator.insert_results(results=results) == []
+    assert sorted(r.metricId for r in notified) == ['metric-0', 'metric-1']
@@ -0,0 +1,145 @@
+import dataclasses
+import time
+import types
+
+import common.loadgen as loadgen
+import common.model as model
+import common.plan as plan
+import common.runner as runner
+
+
+FAST = model.TimeDetail(value=50, unit=model.TimeUnit.MILLISECOND)
+
+
+class FileConnection(loadgen.InMemoryConnection):
+    # worker processes write here, the test process reads the file
+    def __init__(self, path, failures):
+        super().__init__()
+        self.path = path
+        self.failures = failures
+
+    def insert_results(self, results, idempotent=False):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('database unavailable')
+        with open(self.path, 'a') as f:
+            for r in results:
+                f.write(f'{r.componentId}/{r.metricId}\n')
+        return results
+
+
+class Factory:
+    def __init__(self, path, failures=0):
+        self.path = path
+        self.failures = failures
+
+    def make_connection(self):
+        return FileConnection(path=self.path, failures=self.failures)
+
+
+def probe(target):
+    if target.metricId == 'metric-0':
+        time.sleep(2)
+    return model.Result(target.metricId, target.componentId, '200', False, str(time.time()), 1)
+
+
+def _config(metrics=4):
+    cfg = loadgen.synthesize_config(systems=1, components=1, metrics=metrics)
+    return dataclasses.replace(cfg, components=[
+        dataclasses.replace(c, metrics=[dataclasses.replace(m, frequency=FAST) for m in c.metrics])
+        for c in cfg.components
+    ])
+
+
+def _probed(path):
+    try:
+        with open(path) as f:
+            return f.read().split()
+    except FileNotFoundError:
+        return []
+
+
+def _runner(path, **kwargs):
+    kwargs.setdefault('processes', 1)
+    return runner.ProbeRunner(
+        factory=Factory(path=str(path), failures=kwargs.pop('failures', 0)),
+        probe=probe,
+        flush_interval=0.05,
+        supervise_interval=3600,
+        **kwargs,
+    )
+
+
+def test_assign_is_stable_and_follows_leases(tmp_path):
+    targets = list(plan.ProbePlan(components=loadgen.synthesize_config(systems=1, components=4, metrics=25).components))
+    r = _runner(tmp_path / 'results', processes=4)
+
+    shards = r.assign(targets=targets)
+    assert sorted(t for s in shards.values() for t in s) == sorted(targets)
+    assert all(shards.values())
+    assert r.assign(targets=targets) == shards
+
+    owned = {(t.componentId, t.metricId) for t in targets[:10]}
+    r.leases = types.SimpleNamespace(leases=owned)
+    assert {(t.componentId, t.metricId) for s in r.assign(targets=targets).values() for t in s} == owned
+    r.operator.connection.kill()
+
+
+def test_slow_probe_does_not_stall_shard(tmp_path):
+    path = tmp_path / 'results'
+    r = _runner(path, threads=4)
+    r.start()
+    r.apply_config(cfg=_config())
+    time.sleep(1)
+    r.stop()
+
+    probed = _probed(path)
+    assert 'loadgen-component-0-0/metric-0' not in probed
+    assert probed.count('loadgen-component-0-0/metric-1') >= 5
+
+
+def test_worker_survives_failed_flush(tmp_path):
+    path = tmp_path / 'results'
+    r = _runner(path, failures=2)
+    r.start()
+    r.apply_config(cfg=_config())
+    time.sleep(1)
+
+    assert r._workers[0][0].is_alive()
+    r.stop()
+    assert 'loadgen-component-0-0/metric-1' in _probed(path)
+
+
+def test_dead_worker_restarted(tmp_path):
+    path = tmp_path / 'results'
+    r = _runner(path)
+    r.start()
+    r.apply_config(cfg=_config())
+    dead = r._workers[0][0]
+    dead.terminate()
+    dead.join()
+
+    assert r.check_workers() == [0]
+    assert r._workers[0][0].is_alive()
+    assert r.check_workers() == []
+
+    before = len(_probed(path))
+    time.sleep(0.5)
+    r.stop()
+    assert len(_probed(path)) > before
+
+
+def test_scale_reassigns_all_metrics(tmp_path):
+    r = _runner(tmp_path / 'results')
+    r.start()
+    r.apply_config(cfg=_config(metrics=20))
+
+    r.scale(processes=3)
+    assert set(r._workers) == r.ring.nodes == {0, 1, 2}
+    assert sum(len(t) for t in r._assigned.values()) == 20
+    assert all(r._assigned.values())
+
+    r.scale(processes=2)
+    assert set(r._workers) == {0, 1}
+    assert sum(len(t) for t in r._assigned.values()) == 20
+    r.stop()
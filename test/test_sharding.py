@@ -0,0 +1,28 @@
+import common.sharding as sharding
+
+
+def test_hash_ring_stable_assignment():
+    ring = sharding.HashRing(nodes=range(4))
+    keys = [f'component/{i}' for i in range(1000)]
+    assert [ring.get_node(k) for k in keys] == [sharding.HashRing(nodes=range(4)).get_node(k) for k in keys]
+    assert {ring.get_node(k) for k in keys} == {0, 1, 2, 3}
+
+
+def test_hash_ring_add_node_moves_few_keys():
+    ring = sharding.HashRing(nodes=range(4))
+    keys = [f'component/{i}' for i in range(1000)]
+    before = {k: ring.get_node(k) for k in keys}
+
+    ring.add_node(node=4)
+    moved = [k for k in keys if ring.get_node(k) != before[k]]
+
+    assert all(ring.get_node(k) == 4 for k in moved)
+    assert len(moved) < len(keys) / 2
+
+
+def test_hash_ring_remove_node():
+    ring = sharding.HashRing(nodes=range(3))
+    ring.remove_node(node=1)
+
+    assert ring.nodes == {0, 2}
+    assert all(ring.get_node(f'k{i}') != 1 for i in range(100))
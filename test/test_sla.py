@@ -0,0 +1,96 @@
+import datetime
+
+import pytest
+
+import common.exceptions as exceptions
+import common.model as model
+import common.sla as sla
+
+
+UTC = datetime.timezone.utc
+
+
+def _at(hour, minute=0, tz=UTC):
+    return datetime.datetime(2021, 5, 1, hour, minute, tzinfo=tz)
+
+
+class FakeOperator:
+    def __init__(self, frontier=None, rows=()):
+        self.frontier = frontier
+        self.rows = list(rows)
+        self.aggregates = []
+        self.refreshes = []
+
+    def refresh_sla_checkpoints(self, since=None, grace=None):
+        self.refreshes.append((since, grace))
+
+    def select_sla_frontier(self):
+        return self.frontier
+
+    def select_sla_aggregates(self, start, end, checkpoint_start, checkpoint_end):
+        self.aggregates.append((start, end, checkpoint_start, checkpoint_end))
+        return self.rows
+
+
+def test_report_splits_edges_and_checkpoints():
+    operator = FakeOperator(frontier=_at(14))
+    engine = sla.SlaEngine(operator=operator)
+
+    engine.report(start=_at(10, 30), end=_at(15, 30))
+
+    assert operator.aggregates == [(_at(10, 30), _at(15, 30), _at(11), _at(14))]
+
+
+def test_report_without_checkpoints_reads_raw_results():
+    operator = FakeOperator()
+
+    sla.SlaEngine(operator=operator).report(start=_at(10, 30), end=_at(15, 30))
+
+    assert operator.aggregates == [(_at(10, 30), _at(15, 30), _at(15, 30), _at(15, 30))]
+
+
+def test_report_hours_are_utc():
+    operator = FakeOperator(frontier=_at(20))
+    india = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+
+    # 10:00+05:30 is 04:30 UTC, the first full checkpoint hour is 05:00 UTC
+    sla.SlaEngine(operator=operator).report(start=_at(10, tz=india), end=_at(18, tz=india))
+
+    _, _, checkpoint_start, checkpoint_end = operator.aggregates[0]
+    assert checkpoint_start == _at(5)
+    assert checkpoint_end == _at(12)
+
+
+def test_naive_timestamps_rejected():
+    engine = sla.SlaEngine(operator=FakeOperator())
+
+    with pytest.raises(exceptions.OpenmonitorError):
+        engine.report(start=datetime.datetime(2021, 5, 1, 10), end=_at(12))
+    with pytest.raises(exceptions.OpenmonitorError):
+        engine.refresh(since=datetime.datetime(2021, 5, 1, 10))
+
+
+def test_refresh_floors_since_and_passes_grace():
+    operator = FakeOperator()
+    grace = model.TimeDetail(value=10, unit=model.TimeUnit.MINUTE)
+
+    sla.SlaEngine(operator=operator, grace=grace).refresh(since=_at(10, 45))
+    sla.SlaEngine(operator=operator, grace=grace).refresh()
+
+    assert operator.refreshes == [(_at(10), grace), (None, grace)]
+
+
+def test_report_rolls_up_metrics():
+    operator = FakeOperator(rows=[
+        ('a', 'm0', 'sys', 10, 1, 8, 900),
+        ('a', 'm1', 'sys', 10, 0, 10, 1000),
+        ('b', 'm0', 'sys', 0, 0, 0, 0),
+    ])
+
+    reports = sla.SlaEngine(operator=operator).report(start=_at(10), end=_at(12))
+
+    assert reports.metrics[('a', 'm0')].availability == 0.9
+    assert reports.metrics[('a', 'm0')].meanResponseTime == 100
+    assert reports.components['a'] == sla.SlaReport(total=20, timeouts=1, withinSlo=18, responseTimeSum=1900)
+    assert reports.components['b'].availability is None
+    assert reports.systems['sys'].sloCompliance == 0.9
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+import common.database.connection as connection
+import common.database.factory as factory
+import common.database.operations as ops
+import common.exceptions as exceptions
+
+
+def test_statement_timeout():
+    conn = factory.DatabaseConnectionFactory(
+        timeouts=connection.OperationTimeouts(statement=0.2),
+    ).make_connection()
+
+    start = time.monotonic()
+    with pytest.raises(exceptions.OpenmonitorTimeoutError):
+        conn._execute("SELECT pg_sleep(5)", ())
+    assert time.monotonic() - start < 2
+
+    # the connection stays usable afterwards
+    assert conn._execute("SELECT 1", ()).fetchone()[0] == 1
+    conn.kill()
+
+
+def test_operation_budget():
+    conn = factory.DatabaseConnectionFactory().make_connection()
+    operator = ops.DatabaseOperator(
+        connection=conn,
+        timeouts={'select_all_systems': connection.OperationTimeouts(total=0.2)},
+    )
+    conn._execute("CREATE OR REPLACE TEMP VIEW system AS SELECT 'a' AS id, 'b' AS name, 'c' AS ref "
+                  "FROM pg_sleep(5)", ())
+
+    with pytest.raises(exceptions.OpenmonitorTimeoutError):
+        operator.select_all_systems()
+    conn.kill()
+
+
+def test_connect_retry_timeout():
+    fac = factory.DatabaseConnectionFactory(
+        host='127.0.0.1',
+        port=1,
+        timeouts=connection.OperationTimeouts(connect=1),
+        retry_timeout=1,
+    )
+
+    with pytest.raises(exceptions.OpenmonitorTimeoutError):
+        fac.make_connection()
+
+
+def test_watchdog_cancels_once_and_reuses_thread():
+    cancelled = []
+    watchdog = connection._Watchdog(cancel=lambda: cancelled.append(time.monotonic()))
+    threads = threading.active_count()
+
+    for _ in range(100):
+        watchdog.arm(timeout=5)
+        watchdog.disarm()
+    assert threading.active_count() == threads + 1
+
+    start = time.monotonic()
+    watchdog.arm(timeout=0.05)
+    time.sleep(0.3)
+    watchdog.disarm()
+    assert len(cancelled) == 1 and cancelled[0] - start >= 0.05
+
+    watchdog.close()
+    watchdog._thread.join(timeout=1)
+    assert not watchdog._thread.is_alive()
+
+
+def test_factory_reads_timeouts_from_environment(monkeypatch):
+    monkeypatch.setenv('DBSTATEMENTTIMEOUT', '2.5')
+    monkeypatch.delenv('DBCONNECTTIMEOUT', raising=False)
+    assert factory.DatabaseConnectionFactory().timeouts == connection.OperationTimeouts(statement=2.5)
+
+    monkeypatch.setenv('DBCONNECTTIMEOUT', 'soon')
+    with pytest.raises(ValueError):
+        factory.DatabaseConnectionFactory()
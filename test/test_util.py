@@ -0,0 +1,89 @@
+import io
+import json
+import logging
+
+import common.util as util
+
+
+def _record(msg='hello %s', args=('world',), **extra):
+    record = logging.LogRecord('test', logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_log_formatter_levelprefix():
+    formatter = util.LogFormatter(fmt=util.default_fmt_string(), use_colors=False)
+    record = _record()
+
+    assert formatter.format(record).endswith('[INFO] test: hello world')
+
+
+def test_log_formatter_color_message_keeps_record():
+    formatter = util.LogFormatter(fmt='%(levelprefix)s %(message)s', use_colors=True)
+    record = _record(color_message='colored %s')
+
+    assert formatter.format(record).endswith('colored world')
+    assert record.getMessage() == 'hello world'
+
+
+def test_json_log_formatter():
+    formatter = util.JsonLogFormatter(print_thread_id=True)
+
+    entry = json.loads(formatter.format(_record()))
+
+    assert entry['message'] == 'hello world'
+    assert entry['level'] == 'INFO'
+    assert entry['logger'] == 'test'
+    assert 'thread' in entry
+
+
+def test_configure_queue_logging(monkeypatch):
+    stream = io.StringIO()
+    monkeypatch.setattr(util.sys, 'stdout', stream)
+
+    util.configure_default_logging(structured=True, use_queue=True)
+    logging.getLogger('queued').info('via %s', 'queue')
+    util._stop_queue_listener()
+
+    assert json.loads(stream.getvalue())['message'] == 'via queue'
+    util.configure_default_logging()
+
+
+def test_queue_logging_renders_on_caller(monkeypatch):
+    stream = io.StringIO()
+    monkeypatch.setattr(util.sys, 'stdout', stream)
+
+    util.configure_default_logging(structured=True, use_queue=True)
+    state = ['running']
+    logging.getLogger('queued').info('state %s', state)
+    state[0] = 'done'
+    util._stop_queue_listener()
+
+    assert json.loads(stream.getvalue())['message'] == "state ['running']"
+    util.configure_default_logging()
+
+
+def test_queue_logging_keeps_exceptions_and_color_message(monkeypatch):
+    stream = io.StringIO()
+    monkeypatch.setattr(util.sys, 'stdout', stream)
+
+    util.configure_default_logging(structured=True, use_queue=True)
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        logging.getLogger('queued').exception('failed %s', 'here')
+    util._stop_queue_listener()
+
+    entry = json.loads(stream.getvalue())
+    assert entry['message'] == 'failed here'
+    assert 'ValueError: boom' in entry['exception']
+
+    stream.truncate(0)
+    stream.seek(0)
+    util.configure_default_logging(use_queue=True)
+    util._queue_listener.handlers[0].formatter.use_colors = True
+    logging.getLogger('queued').info('plain %s', 'world', extra={'color_message': 'colored %s'})
+    util._stop_queue_listener()
+
+    assert stream.getvalue().rstrip().endswith('colored world')
+    util.configure_default_logging()
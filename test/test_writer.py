@@ -0,0 +1,75 @@
+import logging
+
+import common.database.operations as ops
+import common.database.writer as writer
+import common.model as model
+
+
+class RecordingOperator:
+    def __init__(self):
+        self.batches = []
+
+    def insert_results(self, results):
+        self.batches.append(results)
+        return results
+
+
+class SwallowingConnection:
+    # like DatabaseConnection._run, a rejected statement is logged and rolled back, never raised
+    def __init__(self, available=True):
+        self.available = available
+        self.results = []
+
+    def insert_results(self, results, idempotent=False):
+        if not self.available or any(r.value == 'bad' for r in results):
+            logging.getLogger(__name__).error('invalid input syntax')
+            return None
+        self.results.extend(results)
+        return results
+
+
+def _result(timestamp, value='200'):
+    return model.Result('metric', 'component', value, False, timestamp, 10)
+
+
+def test_writer_batches_and_deduplicates():
+    operator = RecordingOperator()
+    w = writer.ResultWriter(operator=operator, batch_size=2, flush_interval=3600)
+
+    w.write(res=_result('2021-05-01 10:00:00'))
+    w.write(res=_result('2021-05-01 10:00:00', value='retry'))
+    assert not operator.batches
+
+    w.write(res=_result('2021-05-01 10:00:30'))
+    assert [[r.timestamp for r in b] for b in operator.batches] == [['2021-05-01 10:00:00', '2021-05-01 10:00:30']]
+    assert operator.batches[0][0].value == '200'
+
+    w.flush()
+    assert len(operator.batches) == 1
+
+
+def test_rejected_batch_keeps_good_rows():
+    conn = SwallowingConnection()
+    w = writer.ResultWriter(operator=ops.DatabaseOperator(connection=conn), batch_size=100, flush_interval=3600)
+
+    for i, value in enumerate(('200', 'bad', '404')):
+        w.write(res=_result(f'2021-05-01 10:00:0{i}', value=value))
+    w.flush()
+
+    assert [r.value for r in conn.results] == ['200', '404']
+    assert not w._buffer
+
+
+def test_unavailable_database_keeps_buffer():
+    conn = SwallowingConnection(available=False)
+    w = writer.ResultWriter(operator=ops.DatabaseOperator(connection=conn), batch_size=100, flush_interval=3600)
+
+    w.write(res=_result('2021-05-01 10:00:00'))
+    w.write(res=_result('2021-05-01 10:00:01'))
+    w.flush()
+    assert len(w._buffer) == 2
+
+    conn.available = True
+    w.flush()
+    assert len(conn.results) == 2
+    assert not w._buffer